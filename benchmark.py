@@ -0,0 +1,266 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import numpy as np
+from src.holiday_index import HolidayIndex, holidays_in_window
+from src.read_holiday import read_holidays
+from src.solver.distance_cache import cached_distance_matrix
+from src.solver.dp_solver import solve_tep_dp
+from src.solver.instance import TEPInstance
+from src.solver.local_search import solve_tep_local_search
+from src.solver.mip_backends import gurobi_available, solve_tep_mip
+from src.solver.other_strategies import solve_tep_greedy, solve_tsp_greedy, solve_tsp_naive
+from src.solver.pre_processing import plan_cost
+from src.solver.rolling_horizon import solve_rolling_horizon
+
+FILE_NAME = 'data/feriados_com_pos.csv'
+OUTPUT_FILE = 'output/benchmark_results.csv'
+
+RESULT_COLUMNS = [
+    "instance", "start_date", "end_date", "window_days", "n_days", "n_cities",
+    "solver", "status", "warmup", "reps", "time_min_s", "time_median_s", "time_mean_s",
+    "obj_val", "optimal_obj_val", "gap", "error", "revision",
+]
+
+
+@dataclass
+class BenchmarkInstance:
+    """A window of the bundled dataset restricted to a deterministic city subset."""
+
+    name: str
+    start_date: str
+    end_date: str
+    window_days: int
+    tep: TEPInstance          # N, T, holidays, distances views
+    holidays: HolidayIndex    # holiday rows of the chosen cities, for the TSP heuristics
+
+def select_cities(window: HolidayIndex, n_cities: int | None) -> list[str] | None:
+    """
+    Deterministic city subset: first the best-ranked city of every day not yet
+    covered (so each day keeps at least one holiday city), then the remaining
+    cities by number of holiday days (ties by name). `None` if the cover alone
+    needs more than `n_cities` cities.
+    """
+    days_per_city: dict[str, int] = {}
+    for h in window:
+        days_per_city[h.city_name] = days_per_city.get(h.city_name, 0) + 1
+    ranked = sorted(days_per_city, key=lambda city: (-days_per_city[city], city))
+    if n_cities is None or n_cities >= len(ranked):
+        return ranked
+
+    rank = {city: k for k, city in enumerate(ranked)}
+    chosen: list[str] = []
+    chosen_set: set[str] = set()
+    for day in window.dates:
+        day_cities = {h.city_name for h in window.on_date(day)}
+        if not day_cities & chosen_set:
+            best = min(day_cities, key=rank.__getitem__)
+            chosen.append(best)
+            chosen_set.add(best)
+    if len(chosen) > n_cities:
+        return None
+
+    for city in ranked:
+        if len(chosen) == n_cities:
+            break
+        if city not in chosen_set:
+            chosen.append(city)
+            chosen_set.add(city)
+    return chosen
+
+def build_instances(
+    index: HolidayIndex,
+    distance_cache,
+    start_date: str,
+    window_lengths: list[int],
+    city_counts: list[int | None],
+) -> list[BenchmarkInstance]:
+    instances = []
+    for window_days in window_lengths:
+        end_date = (date.fromisoformat(start_date) + timedelta(days=window_days)).isoformat()
+        window = holidays_in_window(index, start_date, end_date)
+        full = TEPInstance.from_holidays(window, start_date, end_date, distance_cache=distance_cache)
+
+        for n_cities in city_counts:
+            cities = select_cities(window, n_cities)
+            if cities is None:
+                print(f"Skipping {window_days} days × {n_cities} cities: covering every day needs more cities")
+                continue
+            subset = set(cities)
+            instances.append(BenchmarkInstance(
+                name=f"{start_date}+{window_days}d_{len(cities)}c",
+                start_date=start_date,
+                end_date=end_date,
+                window_days=window_days,
+                tep=full.restrict(sorted(cities)),
+                holidays=HolidayIndex(h for h in window if h.city_name in subset),
+            ))
+    return instances
+
+def _tep(solver: Callable, **kwargs) -> Callable[[BenchmarkInstance], list[str]]:
+    def run(instance: BenchmarkInstance) -> list[str]:
+        plan, _ = solver(instance.tep.N, instance.tep.T, instance.tep.holidays, instance.tep.distances, **kwargs)
+        return plan
+    return run
+
+def _tsp(solver: Callable) -> Callable[[BenchmarkInstance], list[str]]:
+    def run(instance: BenchmarkInstance) -> list[str]:
+        plan, _ = solver(instance.holidays, instance.start_date, instance.end_date, instance.tep.city_coordinates)
+        return plan
+    return run
+
+def _mip(**kwargs) -> Callable[[BenchmarkInstance], list[str]]:
+    def run(instance: BenchmarkInstance) -> list[str]:
+        # Imported here so the suite runs on machines without gurobipy
+        from src.solver.solver import solve_tep
+        return _tep(solve_tep, **kwargs)(instance)
+    return run
+
+# name -> (run(instance) -> plan, needs Gurobi)
+SOLVERS: dict[str, tuple[Callable[[BenchmarkInstance], list[str]], bool]] = {
+    "dp": (_tep(solve_tep_dp), False),
+    "rolling": (_tep(solve_rolling_horizon), False),
+    "tep_greedy": (_tep(solve_tep_greedy), False),
+    "local_search": (_tep(solve_tep_local_search, time_budget_s=5.0, restarts=4, workers=1), False),
+    "tsp_greedy": (_tsp(solve_tsp_greedy), False),
+    "tsp_naive": (_tsp(solve_tsp_naive), False),
+    "mip_dense": (_mip(), True),
+    "mip_sparse": (_mip(sparse=True), True),
+    "mip_matrix": (_mip(matrix=True), True),
+    "mip_scipy": (_tep(solve_tep_mip, backend="scipy"), False),
+}
+
+def time_solver(run: Callable, instance: BenchmarkInstance, warmup: int, reps: int) -> tuple[list[str], list[float]]:
+    for _ in range(warmup):
+        run(instance)
+    times = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        plan = run(instance)
+        times.append(time.perf_counter() - start)
+    return plan, times
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(
+    instances: list[BenchmarkInstance],
+    solvers: list[str],
+    warmup: int = 1,
+    reps: int = 3,
+) -> list[dict]:
+    """
+    Times every solver on every instance. Costs are all measured with the
+    instance distance matrix, and `gap` is relative to the exact DP optimum.
+    """
+    has_gurobi = any(SOLVERS[name][1] for name in solvers) and gurobi_available()
+    revision = git_revision()
+
+    results = []
+    for instance in instances:
+        distances = instance.tep.distances
+        optimal_plan, _ = solve_tep_dp(instance.tep.N, instance.tep.T, instance.tep.holidays, distances)
+        optimal = plan_cost(optimal_plan, distances)
+
+        for name in solvers:
+            run, needs_gurobi = SOLVERS[name]
+            row = {
+                "instance": instance.name,
+                "start_date": instance.start_date,
+                "end_date": instance.end_date,
+                "window_days": instance.window_days,
+                "n_days": len(instance.tep.T),
+                "n_cities": len(instance.tep.N),
+                "solver": name,
+                "status": "ok",
+                "warmup": warmup,
+                "reps": reps,
+                "optimal_obj_val": optimal,
+                "revision": revision,
+            }
+            if needs_gurobi and not has_gurobi:
+                row["status"] = "skipped"
+                row["error"] = "no Gurobi license"
+            else:
+                try:
+                    plan, times = time_solver(run, instance, warmup, reps)
+                    obj_val = plan_cost(plan, distances)
+                    row.update(
+                        time_min_s=min(times),
+                        time_median_s=statistics.median(times),
+                        time_mean_s=statistics.fmean(times),
+                        obj_val=obj_val,
+                        gap=(obj_val - optimal) / optimal if optimal > 0 else float(obj_val > optimal),
+                    )
+                except Exception as e:
+                    row["status"] = "error"
+                    row["error"] = f"{type(e).__name__}: {e}"
+
+            print(
+                f"{instance.name:<28} {name:<12} {row['status']:<8}"
+                + (f" {row['time_median_s']:10.4f} s  gap {row['gap']:.4%}" if row["status"] == "ok" else "")
+            )
+            results.append(row)
+    return results
+
+def write_results(results: list[dict], output_file: str, metadata: dict) -> None:
+    """Writes the rows as CSV and the run metadata next to it (same name, .json)."""
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(results)
+
+    with open(f"{os.path.splitext(output_file)[0]}.json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+def parse_city_count(value: str) -> int | None:
+    return None if value == "all" else int(value)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Times the TEP solvers on a grid of instances from the bundled dataset.")
+    parser.add_argument("--file", default=FILE_NAME)
+    parser.add_argument("--start-date", default="2025-03-01")
+    parser.add_argument("--windows", type=int, nargs="+", default=[7, 14, 28], help="window lengths in days")
+    parser.add_argument("--cities", type=parse_city_count, nargs="+", default=[25, 100, 400], help="city counts ('all' = no limit)")
+    parser.add_argument("--solvers", nargs="+", choices=list(SOLVERS), default=list(SOLVERS))
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--reps", type=int, default=3)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    holidays = read_holidays(args.file, use_cache=True)
+    index = HolidayIndex(holidays)
+    distance_cache = cached_distance_matrix(holidays)
+    instances = build_instances(index, distance_cache, args.start_date, args.windows, args.cities)
+
+    results = run_benchmarks(instances, args.solvers, args.warmup, args.reps)
+    metadata = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "gurobi_available": gurobi_available(),
+        "args": vars(args),
+    }
+    write_results(results, args.output, metadata)
+    print(f"Wrote {len(results)} rows to {args.output}")
+
+if __name__ == "__main__":
+    main()
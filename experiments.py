@@ -1,7 +1,13 @@
 
 from src.solver.solver import solve_tep
-from src.read_holiday import read_holidays
+from src.read_holiday import iter_holidays, load_holiday_table, read_holidays
+from src.holiday_index import HolidayIndex
 from src.solver.pre_processing import build_tep_inputs
+from src.solver.distance_cache import cached_distance_matrix
+from src.solver.incremental import IncrementalPlanner
+from src.solver.instance import TEPInstance
+from src.experiment_runner import run_experiments, worker_gurobi_threads
+from src.profiling import enable_from_env, profiler
 import pandas as pd
 import matplotlib.pyplot as plt
 import random
@@ -11,17 +17,20 @@ FILE_NAME = 'data/feriados_com_pos.csv'
 
 def experiment_intervals():
     """Roda os experimentos com diferentes intervalos de datas."""
-    holidays = read_holidays(FILE_NAME)
     start_date = '2025-03-01'
 
     end_dates = ['2025-03-05', '2025-03-06', '2025-03-07', '2025-03-08', '2025-03-09']
 
+    # Só as linhas do maior intervalo são lidas; o cache de distâncias cobre todas as cidades
+    holiday_index = HolidayIndex(iter_holidays(FILE_NAME, start_date, max(end_dates)))
+    distance_cache = cached_distance_matrix(load_holiday_table(FILE_NAME))
+
     results = {'date_interval': [], 'plan': [], 'stats': [], 'time': [], 'cost': []}
     for date in end_dates:
         print(f"Experiment for interval {start_date} to {date}")
 
-        N, T, H, dist, city_coordinates = build_tep_inputs(holidays, start_date, date)
-        plan, stats = solve_tep(N, T, H, dist)
+        N, T, H, dist, city_coordinates = build_tep_inputs(holiday_index, start_date, date, distance_cache=distance_cache)
+        plan, stats = solve_tep(N, T, H, dist, sparse=True)
 
         results['date_interval'].append((start_date, date))
         results['plan'].append(plan)
@@ -32,15 +41,32 @@ def experiment_intervals():
     df = pd.DataFrame(results)
     df.to_csv('experiment_intervals_results.csv', index=False)
 
-def restrict_instance(N_selected, T, H_full, dist_full, city_coordinates_full):
-    """Restringe H, dist e coordenadas a um subconjunto de cidades."""
-    N_selected = list(N_selected)
+def experiment_intervals_incremental():
+    """Mesmos intervalos de experiment_intervals, estendendo um único planejador incremental (DP)."""
+    start_date = '2025-03-01'
+
+    end_dates = ['2025-03-05', '2025-03-06', '2025-03-07', '2025-03-08', '2025-03-09']
 
-    H = {(i, t): H_full[i, t] for i in N_selected for t in T}
-    dist = {(i, j): dist_full[i, j] for i in N_selected for j in N_selected}
-    city_coordinates = {i: city_coordinates_full[i] for i in N_selected}
+    # Só as linhas do maior intervalo são lidas; o cache de distâncias cobre todas as cidades
+    holiday_index = HolidayIndex(iter_holidays(FILE_NAME, start_date, max(end_dates)))
+    distance_cache = cached_distance_matrix(load_holiday_table(FILE_NAME))
 
-    return N_selected, T, H, dist, city_coordinates
+    planner = IncrementalPlanner(holiday_index, distance_cache, start_date, start_date)
+    results = {'date_interval': [], 'plan': [], 'stats': [], 'time': [], 'cost': []}
+    for date in end_dates:
+        print(f"Incremental experiment for interval {start_date} to {date}")
+
+        planner.extend(date)
+        plan, stats = planner.plan()
+
+        results['date_interval'].append((start_date, date))
+        results['plan'].append(plan)
+        results['stats'].append(stats)
+        results['time'].append(stats['runtime_s'])
+        results['cost'].append(stats['obj_val'])
+
+    df = pd.DataFrame(results)
+    df.to_csv('experiment_intervals_incremental_results.csv', index=False)
 
 def rank_cities_by_holidays(N, T, H):
     """Ordena cidades por número de feriados no intervalo (maior primeiro)."""
@@ -49,16 +75,17 @@ def rank_cities_by_holidays(N, T, H):
 
 def experiment_cities():
     """Roda experimentos variando o número de cidades."""
-    holidays = read_holidays(FILE_NAME)
-
     start_date = "2025-03-01"
     end_date   = "2025-03-09"
 
-    N_full, T, H_full, dist_full, city_coordinates_full = build_tep_inputs(
-        holidays, start_date, end_date
-    )
+    holidays = list(iter_holidays(FILE_NAME, start_date, end_date))
+    distance_cache = cached_distance_matrix(load_holiday_table(FILE_NAME))
+
+    # Subconjuntos de cidades são visões sobre os arrays desta instância (sem cópias)
+    instance = TEPInstance.from_holidays(holidays, start_date, end_date, distance_cache=distance_cache)
+    N_full, T, H_full, dist_full, city_coordinates_full = instance.inputs()
 
-    plan_full, stats_full = solve_tep(N_full, T, H_full, dist_full)
+    plan_full, stats_full = solve_tep(N_full, T, H_full, dist_full, sparse=True)
     base_cities = sorted(set(plan_full))  # conjunto que cobre os dias
     print("Base cities:", base_cities)
 
@@ -81,11 +108,9 @@ def experiment_cities():
         N_k = base_cities + extra_cities[: max(0, k - len(base_cities))]
         print(f"Experiment with {len(N_k)} cities")
 
-        N_sub, T_sub, H_sub, dist_sub, coord_sub = restrict_instance(
-            N_k, T, H_full, dist_full, city_coordinates_full
-        )
+        sub = instance.restrict(N_k)
 
-        plan, stats = solve_tep(N_sub, T_sub, H_sub, dist_sub)
+        plan, stats = solve_tep(sub.N, sub.T, sub.holidays, sub.distances, sparse=True)
 
         results['date_interval'].append((start_date, end_date))
         results["num_cities"].append(len(N_k))
@@ -98,7 +123,108 @@ def experiment_cities():
     df.to_csv("experiment_cities_results.csv", index=False)
     return df
 
+# Dados carregados uma vez por processo do pool (ver `run_config`)
+_worker_data = {}
+
+
+def _load_worker_data():
+    if not _worker_data:
+        # Nos workers os estágios vão para os stats de cada resultado, sem arquivo de trace
+        if not profiler.enabled:
+            enable_from_env(write_trace=False)
+        holidays = read_holidays(FILE_NAME, use_cache=True)
+        _worker_data['index'] = HolidayIndex(holidays)
+        _worker_data['distances'] = cached_distance_matrix(holidays)
+    return _worker_data['index'], _worker_data['distances']
+
+def run_config(config):
+    """Roda uma configuração de experimento; usado pelos workers de `run_experiments`."""
+    holiday_index, distance_cache = _load_worker_data()
+    start_date, end_date = config['start_date'], config['end_date']
+
+    if config['experiment'] == 'intervals':
+        N, T, H, dist, city_coordinates = build_tep_inputs(holiday_index, start_date, end_date, distance_cache=distance_cache)
+    elif config['experiment'] == 'cities':
+        instance = TEPInstance.from_holidays(holiday_index, start_date, end_date, distance_cache=distance_cache)
+        sub = instance.restrict(config['cities'])
+        N, T, H, dist = sub.N, sub.T, sub.holidays, sub.distances
+    else:
+        raise ValueError(f"experimento desconhecido: {config['experiment']!r}")
+
+    plan, stats = solve_tep(N, T, H, dist, sparse=True, threads=worker_gurobi_threads())
+    return {'plan': plan, 'stats': stats, 'time': stats['runtime_s'], 'cost': stats['obj_val']}
+
+def experiment_intervals_parallel(workers=None, gurobi_threads=1):
+    """experiment_intervals em paralelo; cada resultado vai para o .jsonl assim que termina."""
+    start_date = '2025-03-01'
+    end_dates = ['2025-03-05', '2025-03-06', '2025-03-07', '2025-03-08', '2025-03-09']
+    configs = [{'experiment': 'intervals', 'start_date': start_date, 'end_date': date} for date in end_dates]
+
+    # Aquece os caches em disco antes do pool, para os workers só os abrirem
+    _load_worker_data()
+
+    records = run_experiments(configs, run_config, 'experiment_intervals_results.jsonl', workers, gurobi_threads)
+
+    df = pd.DataFrame({
+        'date_interval': [(r['config']['start_date'], r['config']['end_date']) for r in records],
+        'plan': [r['plan'] for r in records],
+        'stats': [r['stats'] for r in records],
+        'time': [r['time'] for r in records],
+        'cost': [r['cost'] for r in records],
+    })
+    df.to_csv('experiment_intervals_results.csv', index=False)
+    return df
+
+def experiment_cities_parallel(workers=None, gurobi_threads=1):
+    """experiment_cities em paralelo; reiniciar pula os tamanhos já resolvidos."""
+    holiday_index, distance_cache = _load_worker_data()
+
+    start_date = "2025-03-01"
+    end_date   = "2025-03-09"
+
+    instance = TEPInstance.from_holidays(holiday_index, start_date, end_date, distance_cache=distance_cache)
+    N_full, T, H_full, dist_full, city_coordinates_full = instance.inputs()
+
+    # O conjunto base sai do solve da instância completa, que também é um resultado salvo
+    full = run_experiments(
+        [{'experiment': 'cities', 'start_date': start_date, 'end_date': end_date, 'cities': N_full}],
+        run_config, 'experiment_cities_results.jsonl', 1, gurobi_threads,
+    )
+    if not full:
+        raise RuntimeError("o solve da instância completa falhou; veja experiment_cities_results.jsonl")
+    base_cities = sorted(set(full[0]['plan']))
+    print("Base cities:", base_cities)
+
+    ordered_by_holidays = rank_cities_by_holidays(N_full, T, H_full)
+    extra_cities = [c for c in ordered_by_holidays if c not in base_cities]
+
+    sizes_to_test = [len(base_cities) + k for k in range(0, len(extra_cities) + 1, 5)]
+    configs = [
+        {
+            'experiment': 'cities',
+            'start_date': start_date,
+            'end_date': end_date,
+            'cities': base_cities + extra_cities[: max(0, k - len(base_cities))],
+        }
+        for k in sizes_to_test
+    ]
+
+    records = run_experiments(configs, run_config, 'experiment_cities_results.jsonl', workers, gurobi_threads)
+
+    df = pd.DataFrame({
+        "date_interval": [(start_date, end_date) for _ in records],
+        "num_cities": [len(r['config']['cities']) for r in records],
+        "plan": [r['plan'] for r in records],
+        "time": [r['time'] for r in records],
+        "cost": [r['cost'] for r in records],
+        "stats": [r['stats'] for r in records],
+    })
+    df.to_csv("experiment_cities_results.csv", index=False)
+    return df
+
 def main() -> None:
+    # TEP_PROFILE=1 (e opcionalmente TEP_PROFILE_TRACE=trace.json) mede cada estágio
+    enable_from_env()
 
     # experiment_intervals()
 
@@ -1,27 +1,36 @@
 from src.solution_vizualizer import SolutionVizualizer
 from src.solver.other_strategies import solve_tsp_naive, solve_tsp_greedy
 from src.solver.solver import solve_tep
-from src.read_holiday import read_holidays
+from src.read_holiday import iter_holidays, load_holiday_table
+from src.holiday_index import HolidayIndex
 from src.solver.pre_processing import build_tep_inputs
+from src.solver.distance_cache import cached_distance_matrix
+from src.profiling import enable_from_env, profiler
 
 
 def main() -> None:
 
-    # reads holidays
-    FILE_NAME = 'data/feriados_com_pos.csv'
-    holidays = read_holidays(FILE_NAME)
+    # TEP_PROFILE=1 (and optionally TEP_PROFILE_TRACE=trace.json) times each stage
+    enable_from_env()
 
     # Defines time interval
     start_date = '2025-03-01'
     end_date = '2025-03-24'
 
+    # reads only the holidays of the interval; the distance cache covers every city
+    FILE_NAME = 'data/feriados_com_pos.csv'
+    holidays = list(iter_holidays(FILE_NAME, start_date, end_date))
+    holiday_index = HolidayIndex(holidays)
+    distance_cache = cached_distance_matrix(load_holiday_table(FILE_NAME))
+
     # Prepare problem inputs
-    N, T, H, dist, city_coordinates = build_tep_inputs(holidays, start_date, end_date)
+    N, T, H, dist, city_coordinates = build_tep_inputs(holiday_index, start_date, end_date, distance_cache=distance_cache)
 
     # Solve the problem
-    plan, cost = solve_tep(N, T, H, dist)
-    plan_naive, cost_naive = solve_tsp_naive(holidays, start_date, end_date, city_coordinates)
-    plan_greedy, cost_greedy = solve_tsp_greedy(holidays, start_date, end_date, city_coordinates)
+    plan_naive, cost_naive = solve_tsp_naive(holiday_index, start_date, end_date, city_coordinates)
+    plan_greedy, cost_greedy = solve_tsp_greedy(holiday_index, start_date, end_date, city_coordinates)
+    plan, stats = solve_tep(N, T, H, dist, initial_plan=plan_greedy)
+    cost = stats["obj_val"]
 
     # Vizualize the solution
     solution_vizualizer = SolutionVizualizer()
@@ -39,5 +48,8 @@ def main() -> None:
     print(f"Total travel cost_naive: {cost_naive:.2f}\n")
     print(f"Total travel cost_greedy: {cost_greedy:.2f}\n")
 
+    if profiler.enabled:
+        profiler.print_summary()
+
 if __name__ == "__main__":
     main()
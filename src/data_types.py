@@ -1,9 +1,10 @@
 from typing import TypeAlias
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date
 
 # Defines a class that represents each row on the csv file
-@dataclass
+# Rows are immutable and slotted; loaders intern the repeated strings
+@dataclass(frozen=True, slots=True)
 class HolidayData:
     uf: str
     holiday: str
@@ -13,11 +14,13 @@ class HolidayData:
     city_name: str
     lat: float
     lon: float
+    # index of the city in the loader's sorted city table (-1 if unknown). Not part of
+    # equality: the ids depend on the whole file, so streamed rows (iter_holidays) lack them
+    city_id: int = field(default=-1, compare=False)
+    day_of_year: int = field(init=False, compare=False)   # index of the day on the year (1–365/366)
 
-    @property
-    def day_of_year(self) -> int:
-        """Returns the index of the day on the year (1–365/366)."""
-        return self.date.timetuple().tm_yday
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "day_of_year", self.date.timetuple().tm_yday)
 
 # # Defines a solution as a list of indexes of the visited cities 
 # # Solution: TypeAlias = list[int]
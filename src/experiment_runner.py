@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+# Gurobi thread budget of the current worker process (set by the pool initializer)
+_gurobi_threads: int | None = None
+
+
+def worker_gurobi_threads() -> int | None:
+    """Threads each solve in this worker may give Gurobi (None = Gurobi's default)."""
+    return _gurobi_threads
+
+def _init_worker(gurobi_threads: int | None) -> None:
+    global _gurobi_threads
+    _gurobi_threads = gurobi_threads
+
+def config_id(config: dict) -> str:
+    """Stable id of an experiment configuration, used to skip finished runs."""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+def load_completed(results_file: str) -> dict[str, dict]:
+    """Successful records already in the JSON-lines results file, by config id."""
+    completed = {}
+    if not os.path.exists(results_file):
+        return completed
+
+    with open(results_file, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; that configuration simply runs again
+                continue
+            if record.get("status") == "ok":
+                completed[record["config_id"]] = record
+    return completed
+
+def append_result(results_file: str, record: dict) -> None:
+    """Appends one record and syncs it to disk, so it survives an interruption."""
+    with open(results_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=_json_default, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def run_experiments(
+    configs: list[dict],
+    run_config: Callable[[dict], dict],
+    results_file: str,
+    workers: int | None = None,
+    gurobi_threads: int | None = None,
+) -> list[dict]:
+    """
+    Runs `run_config(config)` for every configuration in a process pool and
+    appends each result to `results_file` (JSON lines) as soon as it finishes.
+    Configurations that already have a successful record are skipped, so an
+    interrupted sweep resumes where it stopped. `run_config` must be a
+    module-level function; it can read its Gurobi budget with `worker_gurobi_threads()`.
+    Returns the successful records in the order of `configs`; failed ones are
+    only in `results_file` (status "error"), and a warning says how many.
+    """
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // (gurobi_threads or 1))
+
+    completed = load_completed(results_file)
+    pending = [config for config in configs if config_id(config) not in completed]
+    print(f"{len(configs) - len(pending)} configurations already done, {len(pending)} to run on {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(gurobi_threads,)) as pool:
+        futures = {pool.submit(run_config, config): config for config in pending}
+        for future in as_completed(futures):
+            config = futures[future]
+            try:
+                # The runner's keys come last, so a result carrying e.g. the solver status cannot clash
+                record = {**future.result(), "config_id": config_id(config), "config": config, "status": "ok"}
+            except Exception as e:
+                record = {
+                    "config_id": config_id(config),
+                    "config": config,
+                    "status": "error",
+                    "error": f"{type(e).__name__}: {e}",
+                }
+            append_result(results_file, record)
+
+            if record["status"] == "ok":
+                completed[record["config_id"]] = record
+            print(f"[{record['status']}] {config}")
+
+    failed = [config for config in configs if config_id(config) not in completed]
+    if failed:
+        print(f"WARNING: {len(failed)} of {len(configs)} configurations failed and are missing from the results; see {results_file}")
+    return [completed[config_id(config)] for config in configs if config_id(config) in completed]
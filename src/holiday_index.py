@@ -0,0 +1,78 @@
+from bisect import bisect_left
+from collections.abc import Iterable
+from datetime import date, datetime
+from src.data_types import HolidayData
+
+
+def to_date(value: str | date) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else datetime.fromisoformat(value).date()
+
+class HolidayIndex:
+    """
+    Holidays sorted by date with per-day offsets: `rows[offsets[k]:offsets[k + 1]]`
+    are the holidays on `dates[k]`. Rows of the same day keep their input order.
+    """
+
+    def __init__(self, holidays: Iterable[HolidayData]) -> None:
+        rows = sorted(holidays, key=lambda h: h.date)
+
+        dates: list[date] = []
+        offsets: list[int] = []
+        for pos, h in enumerate(rows):
+            if not dates or h.date != dates[-1]:
+                dates.append(h.date)
+                offsets.append(pos)
+        offsets.append(len(rows))
+
+        self._set(rows, dates, offsets)
+
+    def _set(self, rows: list[HolidayData], dates: list[date], offsets: list[int]) -> None:
+        self.rows = rows
+        self.dates = dates
+        self.offsets = offsets
+        self._date_pos = {d: k for k, d in enumerate(dates)}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def window(self, start_date: str | date, end_date: str | date) -> "HolidayIndex":
+        """Sub-index with the holidays in `start_date <= date < end_date` (binary search)."""
+        first = bisect_left(self.dates, to_date(start_date))
+        last = bisect_left(self.dates, to_date(end_date))
+        base = self.offsets[first]
+
+        sub = HolidayIndex.__new__(HolidayIndex)
+        sub._set(
+            self.rows[base:self.offsets[last]],
+            self.dates[first:last],
+            [offset - base for offset in self.offsets[first:last + 1]],
+        )
+        return sub
+
+    def on_date(self, day: date) -> list[HolidayData]:
+        """Holidays on the given date (empty if there are none)."""
+        pos = self._date_pos.get(day)
+        if pos is None:
+            return []
+        return self.rows[self.offsets[pos]:self.offsets[pos + 1]]
+
+def holidays_in_window(
+    holidays: list[HolidayData] | HolidayIndex,
+    start_date: str,
+    end_date: str,
+) -> HolidayIndex:
+    """Index of the holidays in `[start_date, end_date)`, from a list or an existing index."""
+    if isinstance(holidays, HolidayIndex):
+        return holidays.window(start_date, end_date)
+
+    start_date_formatted = to_date(start_date)
+    end_date_formatted = to_date(end_date)
+    return HolidayIndex(
+        h for h in holidays
+        if start_date_formatted <= h.date < end_date_formatted
+    )
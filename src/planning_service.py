@@ -0,0 +1,205 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from src.holiday_index import HolidayIndex, holidays_in_window
+from src.read_holiday import read_holidays
+from src.solver.distance_cache import cached_distance_matrix
+from src.solver.dp_solver import solve_tep_dp
+from src.solver.other_strategies import solve_tsp_greedy, solve_tsp_naive
+from src.solver.pre_processing import build_tep_inputs, solution_stats
+from src.solver.query_engine import HolidayQueryEngine
+from src.solver.rolling_horizon import solve_rolling_horizon
+
+FILE_NAME = 'data/feriados_com_pos.csv'
+STRATEGIES = ("dp", "query", "greedy", "naive", "rolling", "mip")
+
+
+class LRUCache:
+    """Thread-safe LRU mapping used for plan results."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+class PlanningService:
+    """
+    Keeps the holidays, their index, the all-cities distance matrix, the DP query
+    engine and (lazily) a Gurobi environment in memory, and answers plan requests
+    from them, caching results by (window, city subset, strategy, origin, destination).
+    """
+
+    def __init__(self, filename: str = FILE_NAME, cache_size: int = 256) -> None:
+        self.holidays = read_holidays(filename, use_cache=True)
+        self.index = HolidayIndex(self.holidays)
+        self.distances = cached_distance_matrix(self.holidays)
+        self.query_engine = HolidayQueryEngine(self.index, self.distances)
+        self.cache = LRUCache(cache_size)
+
+        self._gurobi_env = None
+        self._gurobi_lock = threading.Lock()
+
+    def _solve_tep(self, N, T, H, dist):
+        # Imported here so the service runs on machines without gurobipy
+        import gurobipy as gp
+        from src.solver.solver import solve_tep
+
+        # A Gurobi environment is not meant to be shared by concurrent solves
+        with self._gurobi_lock:
+            if self._gurobi_env is None:
+                self._gurobi_env = gp.Env()
+            return solve_tep(N, T, H, dist, sparse=True, env=self._gurobi_env)
+
+    def _solve(self, start_date, end_date, cities, strategy, origin, destination):
+        if strategy == "query":
+            if cities is not None:
+                raise ValueError("strategy 'query' does not support a city subset")
+            return self.query_engine.query(start_date, end_date, origin, destination)
+        if origin is not None or destination is not None:
+            raise ValueError("origin/destination are only supported by strategy 'query'")
+
+        holidays = holidays_in_window(self.index, start_date, end_date)
+        if cities is not None:
+            subset = set(cities)
+            holidays = HolidayIndex(h for h in holidays if h.city_name in subset)
+        if not len(holidays):
+            # No holiday in the window (or the city subset): every strategy gets the empty plan
+            return [], solution_stats([], [], [], 0.0, 0.0)
+
+        N, T, H, dist, city_coordinates = build_tep_inputs(
+            holidays, start_date, end_date, distance_cache=self.distances
+        )
+        if strategy == "dp":
+            return solve_tep_dp(N, T, H, dist)
+        if strategy == "rolling":
+            return solve_rolling_horizon(N, T, H, dist)
+        if strategy == "mip":
+            return self._solve_tep(N, T, H, dist)
+
+        solver = solve_tsp_greedy if strategy == "greedy" else solve_tsp_naive
+        start = time.perf_counter()
+        plan, cost = solver(holidays, start_date, end_date, city_coordinates)
+        return plan, solution_stats(N, T, plan, cost, time.perf_counter() - start, mip_gap=None)
+
+    def plan(self, request: dict) -> dict:
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        start_date = request["start_date"]
+        end_date = request["end_date"]
+        strategy = request.get("strategy", "dp")
+        cities = request.get("cities")
+        origin = request.get("origin")
+        destination = request.get("destination")
+        if not isinstance(start_date, str) or not isinstance(end_date, str):
+            raise ValueError("start_date and end_date must be ISO date strings")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+        if cities is not None and not (isinstance(cities, list) and all(isinstance(c, str) for c in cities)):
+            raise ValueError("cities must be a list of city names")
+        for name, value in (("origin", origin), ("destination", destination)):
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{name} must be a city name")
+
+        key = (
+            start_date,
+            end_date,
+            tuple(sorted(cities)) if cities is not None else None,
+            strategy,
+            origin,
+            destination,
+        )
+        result = self.cache.get(key)
+        if result is not None:
+            return {**result, "cached": True}
+
+        plan, stats = self._solve(start_date, end_date, cities, strategy, origin, destination)
+        if not np.isfinite(stats["obj_val"]):
+            raise ValueError("no feasible plan: origin/destination has no holiday on the first/last day")
+        result = {"plan": plan, "stats": stats}
+        self.cache.put(key, result)
+        return {**result, "cached": False}
+
+def to_json(value) -> str:
+    def default(obj):
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return str(obj)
+
+    return json.dumps(value, default=default, ensure_ascii=False)
+
+def make_handler(service: PlanningService) -> type[BaseHTTPRequestHandler]:
+
+    class PlanningHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict) -> None:
+            body = to_json(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "cached_results": len(service.cache)})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            if self.path != "/plan":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                self._send(200, service.plan(request))
+            except (KeyError, ValueError, RuntimeError) as e:
+                self._send(400, {"error": f"{type(e).__name__}: {e}"})
+            except Exception as e:
+                # e.g. strategy 'mip' without gurobipy or a Gurobi license
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    return PlanningHandler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resident holiday planning service (JSON over HTTP).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--file", default=FILE_NAME)
+    parser.add_argument("--cache-size", type=int, default=256)
+    args = parser.parse_args()
+
+    service = PlanningService(args.file, args.cache_size)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving plans on http://{args.host}:{args.port} (POST /plan, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from itertools import islice
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# TEP_PROFILE=1 turns the stage timers on; TEP_PROFILE_TRACE=<file.json> also
+# writes the trace on exit and TEP_PROFILE_MEMORY=0 skips tracemalloc (faster)
+PROFILE_ENV_VAR = "TEP_PROFILE"
+TRACE_ENV_VAR = "TEP_PROFILE_TRACE"
+MEMORY_ENV_VAR = "TEP_PROFILE_MEMORY"
+
+_MB = 1024 * 1024
+
+
+def peak_rss_mb() -> float | None:
+    """High-water mark of the process resident set size, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / _MB if sys.platform == "darwin" else peak / 1024
+
+class Profiler:
+    """
+    Records wall time, peak traced allocations (tracemalloc) and the process
+    peak RSS of named pipeline stages. Disabled by default, in which case
+    `stage` is a no-op; stages may be nested.
+
+    Safe to use from several threads: each thread has its own stack of open
+    stages and every record carries the thread name. Memory peaks come from
+    the process-wide tracemalloc counters, so they are only exact when one
+    thread runs stages at a time. Only the last `max_records` records are
+    kept; long-running processes can `drain` them.
+    """
+
+    def __init__(self, max_records: int = 100_000) -> None:
+        self.enabled = False
+        self.track_memory = False
+        self.trace_file: str | None = None
+        self.records: deque[dict] = deque(maxlen=max_records)
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._dropped = 0   # records evicted by max_records or drained
+
+    @property
+    def _open(self) -> list[dict]:
+        """Open stages of the calling thread, innermost last."""
+        if not hasattr(self._local, "open"):
+            self._local.open = []
+        return self._local.open
+
+    def enable(self, trace_file: str | None = None, track_memory: bool = True) -> None:
+        if not self.enabled and not self.records:
+            self._origin = time.perf_counter()
+        self.enabled = True
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if trace_file is not None and self.trace_file is None:
+            atexit.register(self.write_trace)
+        self.trace_file = trace_file or self.trace_file
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.track_memory = False
+
+    def stage(self, name: str):
+        """Context manager timing the block as stage `name` (yields the record, or None when disabled)."""
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name: str):
+        open_stages = self._open
+        record = {
+            "stage": name,
+            "depth": len(open_stages),
+            "thread": threading.current_thread().name,
+            "start_s": time.perf_counter() - self._origin,
+        }
+        memory = self.track_memory and tracemalloc.is_tracing()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak is global: hand the peak seen so far to the enclosing stage first
+            if open_stages:
+                open_stages[-1]["_carried_peak"] = max(open_stages[-1]["_carried_peak"], peak)
+            tracemalloc.reset_peak()
+            record["_start_traced"] = current
+            record["_carried_peak"] = current
+
+        open_stages.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["time_s"] = time.perf_counter() - start
+            open_stages.pop()
+            if memory:
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop("_carried_peak"))
+                record["peak_traced_mb"] = (peak - record.pop("_start_traced")) / _MB
+                if open_stages:
+                    open_stages[-1]["_carried_peak"] = max(open_stages[-1]["_carried_peak"], peak)
+            record["peak_rss_mb"] = peak_rss_mb()
+            with self._lock:
+                if len(self.records) == self.records.maxlen:
+                    self._dropped += 1
+                self.records.append(record)
+
+    def mark(self) -> int:
+        """Position to pass to `stages_since` to get only the stages recorded after it."""
+        with self._lock:
+            return self._dropped + len(self.records)
+
+    def stages_since(self, mark: int, all_threads: bool = False) -> list[dict]:
+        """Stages recorded after `mark` by the calling thread (or by every thread)."""
+        thread = threading.current_thread().name
+        with self._lock:
+            records = list(islice(self.records, max(mark - self._dropped, 0), None))
+        if not all_threads:
+            records = [r for r in records if r["thread"] == thread]
+        # Records are appended as stages close; sort back into start order
+        return sorted(records, key=lambda r: r["start_s"])
+
+    def drain(self) -> list[dict]:
+        """Removes and returns every kept record (marks taken before stay valid)."""
+        with self._lock:
+            records = list(self.records)
+            self._dropped += len(records)
+            self.records.clear()
+        return records
+
+    def summary(self) -> dict[str, dict]:
+        """Per stage name: number of calls, total time and largest peaks."""
+        with self._lock:
+            records = list(self.records)
+        summary: dict[str, dict] = {}
+        for record in records:
+            entry = summary.setdefault(record["stage"], {"calls": 0, "time_s": 0.0})
+            entry["calls"] += 1
+            entry["time_s"] += record["time_s"]
+            for key in ("peak_traced_mb", "peak_rss_mb"):
+                if record.get(key) is not None:
+                    entry[key] = max(entry.get(key, 0.0), record[key])
+        return summary
+
+    def write_trace(self, filename: str | None = None) -> None:
+        filename = filename or self.trace_file
+        if filename is None or not self.records:
+            return
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.stages_since(0, all_threads=True), "summary": self.summary()}, f, indent=2)
+
+    def print_summary(self) -> None:
+        for name, entry in self.summary().items():
+            memory = ""
+            if "peak_traced_mb" in entry:
+                memory += f"  peak alloc {entry['peak_traced_mb']:9.1f} MB"
+            if "peak_rss_mb" in entry:
+                memory += f"  peak RSS {entry['peak_rss_mb']:9.1f} MB"
+            print(f"{name:<32} {entry['calls']:>4}x {entry['time_s']:10.3f} s{memory}")
+
+profiler = Profiler()
+
+
+def stage(name: str):
+    """`profiler.stage(name)` on the module-wide profiler."""
+    return profiler.stage(name)
+
+def profiled(name: str):
+    """Decorator that runs every call of the function as stage `name`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiler.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def enable_from_env(write_trace: bool = True) -> bool:
+    """
+    Enables the module-wide profiler if `TEP_PROFILE` is set to a non-zero value.
+    Worker processes pass `write_trace=False` so only the parent writes the trace.
+    """
+    if os.environ.get(PROFILE_ENV_VAR, "0") in ("", "0"):
+        return False
+    profiler.enable(
+        trace_file=(os.environ.get(TRACE_ENV_VAR) or None) if write_trace else None,
+        track_memory=os.environ.get(MEMORY_ENV_VAR, "1") != "0",
+    )
+    return True
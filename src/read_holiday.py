@@ -1,21 +1,84 @@
 import csv
-from datetime import datetime
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+import numpy as np
 from src.data_types import HolidayData
+from src.holiday_index import to_date
+from src.profiling import profiled
 
-def parse_row(row: list[str]) -> HolidayData:
+CACHE_DIR = "data/cache"
+
+# Bump whenever the layout of the binary cache changes; older caches are rebuilt
+CACHE_VERSION = 2
+
+# String columns of the CSV that are interned into tables in the binary cache
+STRING_COLUMNS = ("uf", "holiday", "name", "note", "city_name")
+
+@lru_cache(maxsize=None)
+def parse_date(value: str) -> date:
+    # A year has at most 366 distinct dates, so each one is parsed only once
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def parse_row(row: list[str], city_id: int = -1) -> HolidayData:
+    intern = sys.intern
     return HolidayData(
-        uf=row[0],
-        holiday=row[1],
-        name=row[2],
-        note=row[3] or '',
-        date=datetime.strptime(row[4], "%Y-%m-%d").date(),
-        city_name=row[5],
+        uf=intern(row[0]),
+        holiday=intern(row[1]),
+        name=intern(row[2]),
+        note=intern(row[3] or ''),
+        date=parse_date(row[4]),
+        city_name=intern(row[5]),
         lat=float(row[6]),
         lon=float(row[7]),
+        city_id=city_id,
     )
 
-def read_holidays(filename: str) -> list[HolidayData]:
-    holidays = []
+@profiled("read_holidays")
+def read_holidays(filename: str, use_cache: bool = False) -> Sequence[HolidayData]:
+    """
+    Reads the holidays CSV. With `use_cache=True` the rows come from the binary
+    columnar cache (see `load_holiday_table`) as a read-only sequence that is
+    materialized on first iteration and reused afterwards.
+    """
+    if use_cache:
+        return load_holiday_table(filename).rows()
+
+    rows = []
+
+    with open(filename, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',')
+        next(reader, None)
+        for row in reader:
+            if len(row) < 8 or row[0].lower() == "uf":
+                continue
+            rows.append(row)
+
+    # City ids follow the sorted city names, as in the binary cache
+    city_ids = {city: idx for idx, city in enumerate(sorted({row[5] for row in rows}))}
+    return [parse_row(row, city_ids[row[5]]) for row in rows]
+
+def iter_holidays(
+    filename: str,
+    start: str | date | None = None,
+    end: str | date | None = None,
+    ufs: Iterable[str] | None = None,
+) -> Iterator[HolidayData]:
+    """
+    Streams the holidays with `start <= date < end` (and UF in `ufs`, if given).
+    Rows are filtered on the raw CSV fields, so rows outside the window are
+    never parsed into a `HolidayData`. Bounds that are not valid ISO dates
+    raise `ValueError`.
+    """
+    # Normalized ISO dates compare correctly as strings against the CSV column
+    start_iso = to_date(start).isoformat() if start is not None else None
+    end_iso = to_date(end).isoformat() if end is not None else None
+    ufs = set(ufs) if ufs is not None else None
 
     with open(filename, newline='', encoding='utf-8') as csvfile:
         reader = csv.reader(csvfile, delimiter=',')
@@ -23,6 +86,231 @@ def read_holidays(filename: str) -> list[HolidayData]:
         for row in reader:
             if len(row) < 8 or row[0].lower() == "uf":
                 continue
-            holidays.append(parse_row(row))
+            if start_iso is not None and row[4] < start_iso:
+                continue
+            if end_iso is not None and row[4] >= end_iso:
+                continue
+            if ufs is not None and row[0] not in ufs:
+                continue
+            yield parse_row(row)
+
+@dataclass
+class HolidayTable:
+    """Columnar representation of the holidays CSV, with interned strings."""
+
+    epoch: date                     # day 0 of the `day` column
+    day: np.ndarray                 # int16, days since `epoch`
+    lat: np.ndarray                 # float64
+    lon: np.ndarray                 # float64
+    codes: dict[str, np.ndarray]    # column -> int32 index into `strings[column]`
+    strings: dict[str, list[str]]   # column -> sorted table of distinct values
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @property
+    def city_id(self) -> np.ndarray:
+        return self.codes["city_name"]
+
+    @property
+    def cities(self) -> list[str]:
+        return self.strings["city_name"]
+
+    def date(self, idx: int) -> date:
+        return date.fromordinal(self.epoch.toordinal() + int(self.day[idx]))
+
+    def row(self, idx: int) -> HolidayData:
+        return HolidayData(
+            uf=self.strings["uf"][self.codes["uf"][idx]],
+            holiday=self.strings["holiday"][self.codes["holiday"][idx]],
+            name=self.strings["name"][self.codes["name"][idx]],
+            note=self.strings["note"][self.codes["note"][idx]],
+            date=self.date(idx),
+            city_name=self.cities[self.city_id[idx]],
+            lat=float(self.lat[idx]),
+            lon=float(self.lon[idx]),
+            city_id=int(self.city_id[idx]),
+        )
+
+    def rows(self) -> "HolidayRows":
+        return HolidayRows(self)
+
+class HolidayRows(Sequence):
+    """
+    Read-only `list[HolidayData]` view over a `HolidayTable`. Single rows are
+    built on access; the first full iteration builds every row in one pass and
+    keeps them, so later passes (index, distance cache, visualizer) are free.
+    """
+
+    def __init__(self, table: HolidayTable) -> None:
+        self.table = table
+        self._rows: list[HolidayData] | None = None
+
+    def __len__(self) -> int:
+        return len(self.table)
 
-    return holidays
+    def __getitem__(self, idx):
+        if self._rows is not None:
+            return self._rows[idx]
+        if isinstance(idx, slice):
+            return [self.table.row(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("holiday row index out of range")
+        return self.table.row(idx)
+
+    def __iter__(self):
+        if self._rows is None:
+            self._rows = self._build_rows()
+        return iter(self._rows)
+
+    def _build_rows(self) -> list[HolidayData]:
+        # Bulk column conversion instead of one `row()` call per element
+        table = self.table
+        columns = [
+            [table.strings[column][code] for code in table.codes[column].tolist()]
+            for column in STRING_COLUMNS
+        ]
+        days = table.day.tolist()
+        dates = {day: date.fromordinal(table.epoch.toordinal() + day) for day in set(days)}
+        return [
+            HolidayData(
+                uf=uf, holiday=holiday, name=name, note=note,
+                date=dates[day], city_name=city_name, lat=lat, lon=lon,
+                city_id=city_id,
+            )
+            for uf, holiday, name, note, city_name, day, lat, lon, city_id in zip(
+                *columns, days, table.lat.tolist(), table.lon.tolist(), table.city_id.tolist()
+            )
+        ]
+
+@profiled("read_holidays.parse_csv")
+def build_holiday_table(filename: str) -> HolidayTable:
+    """Parses the CSV once into columns; dates are parsed in a single vectorized pass."""
+    columns: dict[str, list[str]] = {name: [] for name in STRING_COLUMNS}
+    dates, lats, lons = [], [], []
+
+    with open(filename, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',')
+        next(reader, None)
+        for row in reader:
+            if len(row) < 8 or row[0].lower() == "uf":
+                continue
+            columns["uf"].append(row[0])
+            columns["holiday"].append(row[1])
+            columns["name"].append(row[2])
+            columns["note"].append(row[3] or '')
+            columns["city_name"].append(row[5])
+            dates.append(row[4])
+            lats.append(row[6])
+            lons.append(row[7])
+
+    days = np.array(dates, dtype="datetime64[D]")
+    epoch = date(days.min().astype(date).year, 1, 1) if len(days) else date(1970, 1, 1)
+
+    codes, strings = {}, {}
+    for name, values in columns.items():
+        table, inverse = np.unique(np.array(values, dtype=str), return_inverse=True)
+        strings[name] = table.tolist()
+        codes[name] = inverse.astype(np.int32)
+
+    return HolidayTable(
+        epoch=epoch,
+        day=(days - np.datetime64(epoch, "D")).astype(np.int16),
+        lat=np.array(lats, dtype=np.float64),
+        lon=np.array(lons, dtype=np.float64),
+        codes=codes,
+        strings=strings,
+    )
+
+def file_sha256(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _array_files(cache_path: str) -> dict[str, str]:
+    names = ["day", "lat", "lon"] + [f"{column}_id" for column in STRING_COLUMNS]
+    return {name: os.path.join(cache_path, f"{name}.npy") for name in names}
+
+def save_holiday_table(table: HolidayTable, cache_path: str, source: dict) -> None:
+    """
+    Writes the cache; every file goes to a pid-suffixed temp name first and is
+    renamed into place, so processes building the same cache at once never
+    see (or memory-map) a half-written file. meta.json is renamed last.
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    meta_path = os.path.join(cache_path, "meta.json")
+    suffix = f".{os.getpid()}.tmp"
+
+    arrays = {"day": table.day, "lat": table.lat, "lon": table.lon}
+    arrays.update({f"{column}_id": table.codes[column] for column in STRING_COLUMNS})
+    for name, path in _array_files(cache_path).items():
+        # An open file object keeps np.save from appending .npy to the temp name
+        with open(f"{path}{suffix}", "wb") as f:
+            np.save(f, arrays[name])
+        os.replace(f"{path}{suffix}", path)
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": source,
+        "epoch": table.epoch.isoformat(),
+        "strings": table.strings,
+    }
+    with open(f"{meta_path}{suffix}", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(f"{meta_path}{suffix}", meta_path)
+
+def load_holiday_table(filename: str, cache_dir: str = CACHE_DIR) -> HolidayTable:
+    """
+    Loads the holidays as a `HolidayTable`, memory-mapping the binary cache when
+    it is up to date and (re)building it from the CSV otherwise. The cache is
+    checked against the format version and the CSV mtime/size and, if those
+    changed, its SHA-256. Each CSV path gets its own cache directory.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    path_key = hashlib.sha1(os.path.abspath(filename).encode("utf-8")).hexdigest()[:12]
+    cache_path = os.path.join(cache_dir, f"holidays_{stem}_{path_key}")
+    meta_path = os.path.join(cache_path, "meta.json")
+
+    stat = os.stat(filename)
+    source = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": None}
+
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+
+    if meta is not None and meta.get("version") != CACHE_VERSION:
+        meta = None
+
+    if meta is not None:
+        cached = meta["source"]
+        if (cached["mtime_ns"], cached["size"]) != (source["mtime_ns"], source["size"]):
+            source["sha256"] = file_sha256(filename)
+            if cached["sha256"] != source["sha256"]:
+                meta = None
+            else:
+                # Same content, only touched: refresh the stored mtime
+                meta["source"] = source
+                with open(f"{meta_path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(f"{meta_path}.{os.getpid()}.tmp", meta_path)
+
+    if meta is None:
+        table = build_holiday_table(filename)
+        source["sha256"] = source["sha256"] or file_sha256(filename)
+        save_holiday_table(table, cache_path, source)
+        return table
+
+    arrays = {name: np.load(path, mmap_mode="r") for name, path in _array_files(cache_path).items()}
+    return HolidayTable(
+        epoch=date.fromisoformat(meta["epoch"]),
+        day=arrays["day"],
+        lat=arrays["lat"],
+        lon=arrays["lon"],
+        codes={column: arrays[f"{column}_id"] for column in STRING_COLUMNS},
+        strings=meta["strings"],
+    )
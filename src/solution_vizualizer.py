@@ -1,8 +1,108 @@
 import plotly.graph_objects as go
 import plotly.express as px
 import json
+import os
+import re
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from src.data_types import HolidayData
 from collections import defaultdict
+from src.profiling import profiled, stage
+
+BORDER_CACHE_DIR = "data/cache"
+
+
+def simplify_ring(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker simplification of a (n, 2) lon/lat polyline; endpoints are kept."""
+    if tolerance <= 0 or len(points) <= 2:
+        return points
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = points[last] - points[first]
+        offsets = points[first + 1:last] - points[first]
+        length = np.hypot(*segment)
+        if length == 0:
+            # Closed ring: distance to the (repeated) endpoint
+            dists = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            dists = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        k = int(dists.argmax())
+        if dists[k] > tolerance:
+            mid = first + 1 + k
+            keep[mid] = True
+            stack.append((first, mid))
+            stack.append((mid, last))
+    return points[keep]
+
+def merged_border_lines(geojson_path: str, tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    """All polygon rings of the GeoJSON, simplified, in one lon/lat pair separated by NaN."""
+    with open(geojson_path, encoding="utf-8") as f:
+        geo = json.load(f)
+
+    pieces = []
+    separator = np.array([[np.nan, np.nan]])
+    for feature in geo.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "MultiPolygon":
+            rings = [ring for polygon in geometry["coordinates"] for ring in polygon]
+        elif geometry.get("type") == "Polygon":
+            rings = geometry["coordinates"]
+        else:
+            continue
+
+        for ring in rings:
+            pieces.append(simplify_ring(np.asarray(ring, dtype=np.float64)[:, :2], tolerance))
+            pieces.append(separator)
+
+    if not pieces:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+    lines = np.concatenate(pieces).astype(np.float32)
+    return lines[:, 0], lines[:, 1]
+
+def load_border_lines(
+    geojson_path: str,
+    tolerance: float,
+    cache_dir: str | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    `merged_border_lines`, cached on disk per GeoJSON (mtime/size) and tolerance,
+    so the GeoJSON is only parsed and simplified once. `cache_dir` defaults to
+    `BORDER_CACHE_DIR`; caches of older versions of the GeoJSON are removed.
+    """
+    if cache_dir is None:
+        cache_dir = BORDER_CACHE_DIR
+    stat = os.stat(geojson_path)
+    stem = os.path.splitext(os.path.basename(geojson_path))[0]
+    version = f"{stat.st_mtime_ns}_{stat.st_size}"
+    cache_path = os.path.join(cache_dir, f"borders_{stem}_{version}_{tolerance:g}.npz")
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return cached["lon"], cached["lat"]
+
+    lon, lat = merged_border_lines(geojson_path, tolerance)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, lon=lon, lat=lat)
+    os.replace(tmp_path, cache_path)
+
+    # Other tolerances of the same GeoJSON version stay valid; older versions never will be
+    stale = re.compile(rf"borders_{re.escape(stem)}_(\d+_\d+)_[^_]+\.npz")
+    for name in os.listdir(cache_dir):
+        match = stale.fullmatch(name)
+        if match and match.group(1) != version:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass  # removed by a concurrent writer
+    return lon, lat
 
 class SolutionVizualizer:
     """Displays the evolution of holidays across a Brazil map."""
@@ -11,32 +111,28 @@ class SolutionVizualizer:
     OUTPUT_FILE = "output/animated_solution.html"
     BRAZIL_CENTER = dict(lat=-15, lon=-54)
     REPRODUCTION_SPEED = 500
-    LAT_RANGE = [-35, 6] 
+    LAT_RANGE = [-35, 6]
     LON_RANGE = [-75, -30]
+    BORDER_TOLERANCE = 0.01  # degrees (~1 km); 0 keeps every vertex
 
-    def __init__(self) -> None:
+    def __init__(self, border_tolerance: float | None = None) -> None:
+        self.border_tolerance = self.BORDER_TOLERANCE if border_tolerance is None else border_tolerance
         self.fig = go.Figure()
         self._setup_map()
         self._draw_states_contour()
 
+    @profiled("vizualizer.states_contour")
     def _draw_states_contour(self) -> None:
-        """Draw Brazil's state borders from a GeoJSON file."""
-        with open(self.GEOJSON_PATH, encoding="utf-8") as f:
-            geo = json.load(f)
-
-        for feature in geo.get("features", []):
-            if feature.get("geometry", {}).get("type") != "MultiPolygon":
-                continue
-
-            for multipolygon in feature["geometry"]["coordinates"]:
-                for polygon in multipolygon:
-                    lon, lat = zip(*polygon)
-                    self.fig.add_trace(go.Scattergeo(
-                        lon=lon, lat=lat,
-                        mode="lines",
-                        line=dict(width=1, color="black"),
-                        showlegend=False
-                    ))
+        """Draw Brazil's state borders from a GeoJSON file, as a single trace."""
+        lon, lat = load_border_lines(self.GEOJSON_PATH, self.border_tolerance)
+        self.fig.add_trace(go.Scattergeo(
+            lon=lon, lat=lat,
+            mode="lines",
+            line=dict(width=1, color="black"),
+            connectgaps=False,
+            hoverinfo="skip",
+            showlegend=False
+        ))
 
     def _setup_map(self) -> None:
         """Configure base map layout and animation buttons."""
@@ -71,98 +167,233 @@ class SolutionVizualizer:
             updatemenus=[{"type": "buttons", "buttons": [play_btn, pause_btn]}]
         )
 
-    def draw_travel_schedule(
+    def build_figure(
         self,
         holidays: list[HolidayData],
         solutions: list[list[dict[str, float]]]
-    ) -> None:
-        """Animate multiple travel solutions, each with its own color."""
+    ) -> go.Figure:
+        """
+        Animated figure of the travel solutions, each with its own color, on a
+        copy of the base map (which is left untouched for the next call). The
+        styled traces (holidays of the day and one segment per solution) are
+        added once; each frame only carries their new coordinates.
+        """
 
         colors = px.colors.qualitative.Plotly
+        fig = go.Figure(self.fig)
 
-        by_day = defaultdict(list)
-        for h in holidays:
-            by_day[h.day_of_year].append(h)
+        # The borders come first; the animated traces come after them
+        first_animated = len(fig.data)
+        fig.add_trace(go.Scattergeo(
+            lon=[], lat=[],
+            mode="markers",
+            marker=dict(size=7, color="green"),
+        ))
+        for idx in range(len(solutions)):
+            fig.add_trace(go.Scattergeo(
+                lon=[], lat=[],
+                mode="lines+markers",
+                line=dict(width=2, color=colors[idx % len(colors)]),
+                marker=dict(size=6, color="red"),
+            ))
+        animated = list(range(first_animated, len(fig.data)))
 
         frames = []
-        days = sorted(by_day.keys())
-
-        num_solutions = len(solutions)
+        with stage("vizualizer.frames"):
+            for step, (day, cities, segments) in enumerate(schedule_steps(holidays, solutions)):
+                date_label = cities[0].date.strftime("%d/%m/%Y")
 
-        for step, day in enumerate(days):
+                # Feridos do dia
+                frame_data = [
+                    go.Scattergeo(
+                        lon=[c.lon for c in cities],
+                        lat=[c.lat for c in cities],
+                        name=f"Day {day}",
+                    )
+                ]
 
-            if any(step >= len(sol) - 1 for sol in solutions):
-                break
+                # Anotações
+                annotations = [
+                    dict(
+                        text=date_label,
+                        x=1, y=0.95,
+                        xref="paper", yref="paper",
+                        showarrow=False,
+                        font=dict(size=18),
+                    )
+                ]
 
-            cities = by_day[day]
-            lons = [c.lon for c in cities]
-            lats = [c.lat for c in cities]
-            date_label = cities[0].date.strftime("%d/%m/%Y")
+                # Segmentos de soluções
+                for idx, (city_from, city_to) in enumerate(segments):
+                    color = colors[idx % len(colors)]
+                    label = f"Sol {idx+1}: {city_from['name']} → {city_to['name']}"
 
-            frame_data = []
+                    frame_data.append(
+                        go.Scattergeo(
+                            lon=[city_from["lon"], city_to["lon"]],
+                            lat=[city_from["lat"], city_to["lat"]],
+                            name=label,
+                        )
+                    )
+                    annotations.append(
+                        dict(
+                            text=f"<span style='color:{color}'>{label}</span>",
+                            x=1, y=0.90 - idx * 0.07,
+                            xref="paper", yref="paper",
+                            showarrow=False,
+                            font=dict(size=16),
+                        )
+                    )
 
-            # Feridos do dia
-            frame_data.append(
-                go.Scattergeo(
-                    lon=lons,
-                    lat=lats,
-                    mode="markers",
-                    marker=dict(size=7, color="green"),
-                    name=f"Day {day}",
+                frames.append(
+                    go.Frame(
+                        name=str(step),
+                        data=frame_data,
+                        traces=animated,
+                        layout=go.Layout(annotations=annotations),
+                    )
                 )
-            )
 
-            # Segmentos de soluções
-            for idx, sol in enumerate(solutions):
-                city_from = sol[step]
-                city_to = sol[step + 1]
-                color = colors[idx % len(colors)]
+        # The figure opens on the first day
+        if frames:
+            for trace_idx, trace in zip(animated, frames[0].data):
+                fig.data[trace_idx].update(lon=trace.lon, lat=trace.lat, name=trace.name)
+            fig.update_layout(annotations=frames[0].layout.annotations)
 
-                frame_data.append(
-                    go.Scattergeo(
-                        lon=[city_from["lon"], city_to["lon"]],
-                        lat=[city_from["lat"], city_to["lat"]],
-                        mode="lines+markers",
-                        line=dict(width=2, color=color),
-                        marker=dict(size=6, color="red"),
-                        name=f"Sol {idx+1}: {city_from['name']} → {city_to['name']}",
-                    )
-                )
+        fig.frames = frames
+        return fig
 
-            # Anotações
-            annotations = [
-                dict(
-                    text=date_label,
-                    x=1, y=0.95,
-                    xref="paper", yref="paper",
-                    showarrow=False,
-                    font=dict(size=18),
-                )
-            ]
+    @profiled("vizualizer.travel_schedule")
+    def draw_travel_schedule(
+        self,
+        holidays: list[HolidayData],
+        solutions: list[list[dict[str, float]]],
+        output_file: str | None = None,
+        show: bool = True,
+        include_plotlyjs: bool | str = True,
+    ) -> go.Figure:
+        """Animate multiple travel solutions and write them to `output_file` (default `OUTPUT_FILE`)."""
+        fig = self.build_figure(holidays, solutions)
+        with stage("vizualizer.write_html"):
+            fig.write_html(output_file or self.OUTPUT_FILE, include_plotlyjs=include_plotlyjs)
+        if show:
+            fig.show()
+        return fig
 
-            for idx, sol in enumerate(solutions):
-                city_from = sol[step]
-                city_to = sol[step + 1]
-                color = colors[idx % len(colors)]
+def schedule_steps(
+    holidays: list[HolidayData],
+    solutions: list[list[dict[str, float]]],
+) -> list[tuple[int, list[HolidayData], list[tuple[dict, dict]]]]:
+    """
+    One (day of year, holidays of the day, [(from, to) per solution]) per
+    animation step, stopping when the shortest solution runs out of moves.
+    """
+    by_day = defaultdict(list)
+    for h in holidays:
+        by_day[h.day_of_year].append(h)
 
-                annotations.append(
-                    dict(
-                        text=f"<span style='color:{color}'>Sol {idx+1}: {city_from['name']} → {city_to['name']}</span>",
-                        x=1, y=0.90 - idx * 0.07,
-                        xref="paper", yref="paper",
-                        showarrow=False,
-                        font=dict(size=16),
-                    )
-                )
+    steps = []
+    for step, day in enumerate(sorted(by_day.keys())):
+        if any(step >= len(sol) - 1 for sol in solutions):
+            break
+        steps.append((day, by_day[day], [(sol[step], sol[step + 1]) for sol in solutions]))
+    return steps
 
-            frames.append(
-                go.Frame(
-                    name=str(step),
-                    data=frame_data,
-                    layout=go.Layout(annotations=annotations),
-                )
-            )
+def frame_payload(
+    holidays: list[HolidayData],
+    solutions: list[list[dict[str, float]]],
+    decimals: int = 5,
+) -> dict:
+    """
+    Compact JSON alternative to the plotly HTML: each city appears once in a
+    table and days and solutions refer to it by index. `holidays[k]` lists the
+    holiday cities of `dates[k]` and `solutions[s][k]` is where solution s is
+    on that day (one more entry than `dates`, the arrival of the last move).
+    """
+    steps = schedule_steps(holidays, solutions)
+
+    index: dict[str, int] = {}
+    table = {"name": [], "lon": [], "lat": []}
+
+    def city_index(name: str, lon: float, lat: float) -> int:
+        if name not in index:
+            index[name] = len(table["name"])
+            table["name"].append(name)
+            table["lon"].append(round(float(lon), decimals))
+            table["lat"].append(round(float(lat), decimals))
+        return index[name]
+
+    days = [[city_index(h.city_name, h.lon, h.lat) for h in cities] for _, cities, _ in steps]
+    paths = [
+        [city_index(city["name"], city["lon"], city["lat"]) for city in sol[:len(steps) + 1]]
+        for sol in solutions
+    ] if steps else [[] for _ in solutions]
+
+    return {
+        "dates": [cities[0].date.isoformat() for _, cities, _ in steps],
+        "cities": table,
+        "holidays": days,
+        "solutions": paths,
+    }
+
+def write_frame_payload(
+    holidays: list[HolidayData],
+    solutions: list[list[dict[str, float]]],
+    output_file: str,
+) -> None:
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(frame_payload(holidays, solutions), f, ensure_ascii=False, separators=(",", ":"))
+
+# State of each batch rendering worker (see `render_batch`)
+_batch_vizualizer: SolutionVizualizer | None = None
+_batch_holidays: list[HolidayData] = []
+
+
+def _init_batch_worker(holidays: list[HolidayData], border_tolerance: float | None, fmt: str) -> None:
+    global _batch_vizualizer, _batch_holidays
+    _batch_holidays = holidays
+    # The base map is built once per worker and reused for every run it renders
+    if fmt == "html":
+        _batch_vizualizer = SolutionVizualizer(border_tolerance)
+
+def _render_run(run: dict, output_dir: str, fmt: str) -> str:
+    output_file = os.path.join(output_dir, f"{run['name']}.{fmt}")
+    if fmt == "json":
+        write_frame_payload(_batch_holidays, run["solutions"], output_file)
+    else:
+        # plotly.js is written once to output_dir and shared by every file
+        _batch_vizualizer.draw_travel_schedule(
+            _batch_holidays, run["solutions"], output_file, show=False, include_plotlyjs="directory"
+        )
+    return output_file
+
+def render_batch(
+    holidays: list[HolidayData],
+    runs: list[dict],
+    output_dir: str,
+    fmt: str = "html",
+    workers: int | None = None,
+    border_tolerance: float | None = None,
+) -> list[str]:
+    """
+    Headless rendering of many solutions: each run (`{"name": ..., "solutions":
+    [...]}`, solutions as in `draw_travel_schedule`) is written to
+    `output_dir/<name>.html` (or `.json`, see `frame_payload`) by a pool of
+    worker processes, without opening a browser. Returns the written files.
+    """
+    if fmt not in ("html", "json"):
+        raise ValueError(f"unknown format {fmt!r}, expected 'html' or 'json'")
+    os.makedirs(output_dir, exist_ok=True)
+
+    holidays = list(holidays)
+    if fmt == "html":
+        # Simplify the borders here so the workers only read the disk cache
+        tolerance = SolutionVizualizer.BORDER_TOLERANCE if border_tolerance is None else border_tolerance
+        load_border_lines(SolutionVizualizer.GEOJSON_PATH, tolerance)
 
-        self.fig.frames = frames
-        self.fig.write_html(self.OUTPUT_FILE)
-        self.fig.show()
\ No newline at end of file
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_batch_worker,
+        initargs=(holidays, border_tolerance, fmt),
+    ) as pool:
+        return list(pool.map(_render_run, runs, repeat(output_dir), repeat(fmt)))
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import numpy as np
+from src.data_types import HolidayData
+from src.profiling import profiled, stage
+from src.read_holiday import HolidayRows, HolidayTable
+from src.solver.pre_processing import DistanceMatrix, haversine_matrix
+
+CACHE_DIR = "data/cache"
+
+
+def city_coordinates_table(
+    holidays: list[HolidayData] | HolidayRows | HolidayTable,
+) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    Cidades (ordenadas) e suas coordenadas, uma vez por cidade. Da tabela
+    colunar (ou da sua visão de linhas) sai direto das colunas, sem criar linhas.
+    """
+    if isinstance(holidays, HolidayRows):
+        holidays = holidays.table
+    if isinstance(holidays, HolidayTable):
+        # Os nomes da tabela já são ordenados; a primeira linha de cada cidade dá as coordenadas
+        ids, first = np.unique(holidays.city_id, return_index=True)
+        cities = [holidays.cities[k] for k in ids.tolist()]
+        return cities, np.asarray(holidays.lat[first], dtype=np.float64), np.asarray(holidays.lon[first], dtype=np.float64)
+
+    coords: dict[str, tuple[float, float]] = {}
+    for h in holidays:
+        if h.city_name not in coords:
+            coords[h.city_name] = (h.lat, h.lon)
+
+    cities = sorted(coords)
+    lat = np.array([coords[c][0] for c in cities], dtype=np.float64)
+    lon = np.array([coords[c][1] for c in cities], dtype=np.float64)
+    return cities, lat, lon
+
+def coordinates_fingerprint(cities: list[str], lat: np.ndarray, lon: np.ndarray) -> str:
+    """Hash das cidades e coordenadas; muda sempre que alguma coordenada do CSV mudar."""
+    digest = hashlib.sha256()
+    digest.update("\n".join(cities).encode("utf-8"))
+    digest.update(lat.tobytes())
+    digest.update(lon.tobytes())
+    return digest.hexdigest()[:16]
+
+@profiled("cached_distance_matrix")
+def cached_distance_matrix(
+    holidays: list[HolidayData] | HolidayRows | HolidayTable,
+    cache_dir: str = CACHE_DIR,
+    dtype=np.float64,
+) -> DistanceMatrix:
+    """
+    Matriz de distâncias entre todas as cidades, mapeada em memória a partir do
+    disco. É calculada só na primeira chamada para um dado conjunto de
+    coordenadas; as seguintes apenas abrem o memmap. O padrão float64 dá os
+    mesmos custos de `build_tep_inputs` sem cache; `dtype=np.float32` reduz o
+    arquivo à metade, com arredondamento nos objetivos.
+    """
+    cities, lat, lon = city_coordinates_table(holidays)
+    key = f"{coordinates_fingerprint(cities, lat, lon)}_{np.dtype(dtype).name}"
+    matrix_path = os.path.join(cache_dir, f"distances_{key}.npy")
+    cities_path = os.path.join(cache_dir, f"cities_{key}.json")
+
+    if not (os.path.exists(matrix_path) and os.path.exists(cities_path)):
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Escreve em arquivos temporários e renomeia, para nunca deixar um cache pela metade
+        tmp_matrix_path = f"{matrix_path}.{os.getpid()}.tmp"
+        tmp_cities_path = f"{cities_path}.{os.getpid()}.tmp"
+        out = np.lib.format.open_memmap(tmp_matrix_path, mode="w+", dtype=dtype, shape=(len(cities), len(cities)))
+        with stage("cached_distance_matrix.haversine"):
+            haversine_matrix(lat, lon, dtype=dtype, out=out)
+        out.flush()
+        del out
+        with open(tmp_cities_path, "w", encoding="utf-8") as f:
+            json.dump(cities, f, ensure_ascii=False)
+
+        os.replace(tmp_matrix_path, matrix_path)
+        os.replace(tmp_cities_path, cities_path)
+
+    with open(cities_path, encoding="utf-8") as f:
+        cached_cities = json.load(f)
+
+    return DistanceMatrix(np.load(matrix_path, mmap_mode="r"), cached_cities)
@@ -0,0 +1,146 @@
+import time
+import numpy as np
+from src.profiling import profiled, profiler, stage
+from src.solver.pre_processing import DistanceMatrix, HolidayMatrix, solution_stats
+
+
+def layer_cities(N, T, holidays) -> list[list[str]]:
+    """Cidades com feriado em cada dia (as camadas do grafo)."""
+    if isinstance(holidays, HolidayMatrix):
+        sub = np.asarray(holidays.matrix[holidays.indices(N)][:, list(T)], dtype=bool)
+        return [[N[k] for k in np.flatnonzero(sub[:, idx])] for idx in range(len(T))]
+    return [[city for city in N if holidays[city, time]] for time in T]
+
+def layer_distances(distances, from_cities: list[str], to_cities: list[str]) -> np.ndarray:
+    """Submatriz de distâncias entre duas camadas consecutivas."""
+    if isinstance(distances, DistanceMatrix):
+        return distances.block(from_cities, to_cities).astype(np.float64, copy=False)
+    return np.array(
+        [[distances[i, j] for j in to_cities] for i in from_cities],
+        dtype=np.float64,
+    ).reshape(len(from_cities), len(to_cities))
+
+@profiled("solve_tep_dp")
+def solve_tep_dp(N, T, holidays, distances) -> tuple[list[str], dict]:
+    """
+    Resolve o TEP de forma exata como caminho mínimo no grafo em camadas
+    (um dia por camada), com a recorrência de Viterbi vetorizada por camada.
+    """
+    start = time.perf_counter()
+    profile_mark = profiler.mark()
+
+    with stage("solve_tep_dp.layers"):
+        layers = layer_cities(N, T, holidays)
+    for time_idx, cities in zip(T, layers):
+        if not cities:
+            raise RuntimeError(f"DP infeasible: no holiday city at time {time_idx}")
+
+    chosen: list[str] = []
+    obj_val = 0.0
+    num_arcs = 0
+
+    if layers:
+        # cost[k] = menor custo de um caminho que termina em layers[t][k]
+        cost = np.zeros(len(layers[0]))
+        backpointers = []
+        with stage("solve_tep_dp.forward"):
+            for t in range(1, len(layers)):
+                d = layer_distances(distances, layers[t - 1], layers[t])
+                num_arcs += d.size
+
+                total = cost[:, None] + d
+                best_prev = total.argmin(axis=0)
+                cost = total[best_prev, np.arange(d.shape[1])]
+                backpointers.append(best_prev)
+
+        k = int(cost.argmin())
+        obj_val = float(cost[k])
+
+        # Reconstrói o caminho de trás para frente
+        path = [k]
+        for best_prev in reversed(backpointers):
+            k = int(best_prev[k])
+            path.append(k)
+        path.reverse()
+        chosen = [layers[t][k] for t, k in enumerate(path)]
+
+    runtime = time.perf_counter() - start
+
+    stats = solution_stats(
+        N, T, chosen, obj_val, runtime,
+        mip_gap=0.0,
+        num_vars=None,
+        num_bin_vars=None,
+        num_constrs=None,
+        graph_nodes=sum(len(cities) for cities in layers),
+        num_arcs=num_arcs,
+    )
+    if profiler.enabled:
+        stats["stages"] = profiler.stages_since(profile_mark)
+
+    return chosen, stats
+
+def k_best_plans(N, T, holidays, distances, k: int = 5, max_block: int = 4_000_000) -> list[dict]:
+    """
+    Os k itinerários distintos mais baratos (caminhos k-mínimos no grafo em
+    camadas), via Viterbi com lista: cada cidade de cada dia guarda os k melhores
+    caminhos parciais que chegam nela. Retorna dicts {"plan", "obj_val"} em
+    ordem crescente de custo. `max_block` limita o tamanho dos blocos de candidatos.
+    """
+    layers = layer_cities(N, T, holidays)
+    for time_idx, cities in zip(T, layers):
+        if not cities:
+            raise RuntimeError(f"DP infeasible: no holiday city at time {time_idx}")
+    if not layers:
+        return [{"plan": [], "obj_val": 0.0}]
+
+    # cost[i, r] = custo do r-ésimo melhor caminho que termina em layers[t][i]
+    cost = np.full((len(layers[0]), k), np.inf)
+    cost[:, 0] = 0.0
+    backpointers = []
+    for t in range(1, len(layers)):
+        d = layer_distances(distances, layers[t - 1], layers[t])
+        n_prev, n_cur = d.shape
+        flat_prev = cost.reshape(-1)
+        keep = min(k, flat_prev.size)
+
+        new_cost = np.full((n_cur, k), np.inf)
+        prev_node = np.zeros((n_cur, k), dtype=np.int64)
+        prev_rank = np.zeros((n_cur, k), dtype=np.int64)
+
+        chunk = max(1, max_block // flat_prev.size)
+        for first in range(0, n_cur, chunk):
+            last = min(first + chunk, n_cur)
+            # Linha i * k + r: r-ésimo caminho até a cidade i do dia anterior
+            candidates = flat_prev[:, None] + np.repeat(d[:, first:last], k, axis=0)
+            best = np.argpartition(candidates, keep - 1, axis=0)[:keep]
+            values = np.take_along_axis(candidates, best, axis=0)
+            order = np.argsort(values, axis=0, kind="stable")
+            best = np.take_along_axis(best, order, axis=0)
+
+            new_cost[first:last, :keep] = np.take_along_axis(values, order, axis=0).T
+            prev_node[first:last, :keep] = (best // k).T
+            prev_rank[first:last, :keep] = (best % k).T
+
+        cost = new_cost
+        backpointers.append((prev_node, prev_rank))
+
+    flat = cost.reshape(-1)
+    ends = np.argsort(flat, kind="stable")[:k]
+
+    plans = []
+    for end in ends:
+        if not np.isfinite(flat[end]):
+            break
+        node, rank = divmod(int(end), k)
+        path = [node]
+        for prev_node, prev_rank in reversed(backpointers):
+            node, rank = int(prev_node[node, rank]), int(prev_rank[node, rank])
+            path.append(node)
+        path.reverse()
+        plans.append({
+            "plan": [layers[t][i] for t, i in enumerate(path)],
+            "obj_val": float(flat[end]),
+        })
+
+    return plans
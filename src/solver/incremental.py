@@ -0,0 +1,165 @@
+import time
+from datetime import date, timedelta
+import numpy as np
+from src.data_types import HolidayData
+from src.holiday_index import HolidayIndex, to_date
+from src.solver.dp_solver import layer_distances
+from src.solver.pre_processing import solution_stats
+
+
+class IncrementalPlanner:
+    """
+    Planejador exato (DP em camadas) para uma janela de datas que muda aos poucos.
+    Guarda as camadas, os blocos de distância entre camadas consecutivas e os
+    custos da DP de cada camada: estender ou encurtar o fim da janela só mexe nos
+    dias novos/removidos; mover o início reaproveita os blocos já calculados e
+    refaz apenas a recorrência.
+    """
+
+    def __init__(
+        self,
+        holidays: list[HolidayData] | HolidayIndex,
+        distances,
+        start_date: str | date,
+        end_date: str | date,
+    ) -> None:
+        self.index = holidays if isinstance(holidays, HolidayIndex) else HolidayIndex(holidays)
+        self.distances = distances
+
+        self.start_date = to_date(start_date)
+        self.end_date = self.start_date
+        self.dates: list[date] = []
+        self.layers: list[list[str]] = []
+        self.blocks: list[np.ndarray] = []        # blocks[k]: layers[k] -> layers[k + 1]
+        self.costs: list[np.ndarray] = []         # custo mínimo até cada cidade da camada
+        self.backpointers: list[np.ndarray] = []  # backpointers[k]: melhor antecessor em layers[k + 1]
+        self.last_update: dict[str, float] = {}
+
+        self.set_window(start_date, end_date)
+
+    def _layer(self, day: date) -> list[str]:
+        return sorted({h.city_name for h in self.index.on_date(day)})
+
+    def _advance(self, block: np.ndarray) -> None:
+        total = self.costs[-1][:, None] + block
+        best_prev = total.argmin(axis=0)
+        self.costs.append(total[best_prev, np.arange(block.shape[1])])
+        self.backpointers.append(best_prev)
+
+    def _append(self, day: date) -> None:
+        layer = self._layer(day)
+        if self.layers:
+            block = layer_distances(self.distances, self.layers[-1], layer)
+            self.blocks.append(block)
+            self._advance(block)
+        else:
+            self.costs.append(np.zeros(len(layer)))
+        self.dates.append(day)
+        self.layers.append(layer)
+
+    def _pop(self) -> None:
+        self.dates.pop()
+        self.layers.pop()
+        if self.blocks:
+            self.blocks.pop()
+        # Corta pelo tamanho em vez de um pop: com o início recém-movido os custos ainda serão refeitos
+        del self.costs[len(self.layers):], self.backpointers[len(self.blocks):]
+
+    def _recompute(self) -> None:
+        self.costs = [np.zeros(len(self.layers[0]))] if self.layers else []
+        self.backpointers = []
+        for block in self.blocks:
+            self._advance(block)
+
+    def set_window(self, start_date: str | date, end_date: str | date) -> None:
+        """Move a janela para `[start_date, end_date)` fazendo só o trabalho marginal."""
+        update_start = time.perf_counter()
+        start, end = to_date(start_date), to_date(end_date)
+        added = dropped = recomputed = 0
+        start_moved = False
+
+        if start != self.start_date and self.dates:
+            # Remove do início os dias que saíram da janela
+            drop = 0
+            while drop < len(self.dates) and self.dates[drop] < start:
+                drop += 1
+            del self.dates[:drop], self.layers[:drop], self.blocks[:drop]
+            dropped += drop
+
+            # Acrescenta no início os dias que entraram na janela
+            front_end = self.dates[0] if self.dates else start
+            new_dates = self.index.window(start, min(front_end, end)).dates
+            new_layers = [self._layer(day) for day in new_dates]
+            if self.layers and new_layers:
+                new_layers.append(self.layers[0])
+            new_blocks = [
+                layer_distances(self.distances, new_layers[k], new_layers[k + 1])
+                for k in range(len(new_layers) - 1)
+            ]
+            self.dates[:0] = new_dates
+            self.layers[:0] = new_layers[:len(new_dates)]
+            self.blocks[:0] = new_blocks
+            added += len(new_dates)
+            start_moved = True
+
+        self.start_date = start
+
+        # Ajusta o fim da janela
+        while self.dates and self.dates[-1] >= end:
+            self._pop()
+            dropped += 1
+
+        # Refaz a recorrência só sobre as camadas que ficaram
+        if start_moved:
+            self._recompute()
+            recomputed = len(self.layers)
+
+        append_from = self.dates[-1] + timedelta(days=1) if self.dates else start
+        for day in self.index.window(append_from, end).dates:
+            self._append(day)
+            added += 1
+
+        self.end_date = end
+        self.last_update = {
+            "layers_added": added,
+            "layers_dropped": dropped,
+            "layers_recomputed": recomputed,
+            "update_time_s": time.perf_counter() - update_start,
+        }
+
+    def extend(self, end_date: str | date) -> None:
+        self.set_window(self.start_date, end_date)
+
+    def slide(self, start_date: str | date, end_date: str | date) -> None:
+        self.set_window(start_date, end_date)
+
+    def plan(self) -> tuple[list[str], dict]:
+        """Plano ótimo da janela atual, com o mesmo contrato (plan, stats) de `solve_tep`."""
+        start = time.perf_counter()
+
+        chosen: list[str] = []
+        obj_val = 0.0
+        if self.layers:
+            k = int(self.costs[-1].argmin())
+            obj_val = float(self.costs[-1][k])
+
+            path = [k]
+            for best_prev in reversed(self.backpointers):
+                k = int(best_prev[k])
+                path.append(k)
+            path.reverse()
+            chosen = [layer[k] for layer, k in zip(self.layers, path)]
+
+        stats = solution_stats(
+            sorted({city for layer in self.layers for city in layer}),
+            self.dates,
+            chosen,
+            obj_val,
+            self.last_update["update_time_s"] + time.perf_counter() - start,
+            mip_gap=0.0,
+            graph_nodes=sum(len(layer) for layer in self.layers),
+            num_arcs=sum(block.size for block in self.blocks),
+            **self.last_update,
+        )
+
+        return chosen, stats
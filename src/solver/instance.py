@@ -0,0 +1,98 @@
+import numpy as np
+from src.data_types import HolidayData
+from src.holiday_index import HolidayIndex, holidays_in_window
+from src.solver.pre_processing import DistanceMatrix, HolidayMatrix, haversine_matrix
+
+
+class TEPInstance:
+    """
+    Instância do TEP guardada em arrays compartilhados: matriz 0/1 de feriados
+    (cidades × dias), matriz de distâncias e coordenadas. `restrict` devolve uma
+    nova instância que só guarda o array de índices das cidades escolhidas, sem
+    copiar feriados nem distâncias. `holidays` e `distances` são visões com a
+    mesma interface `H[i, t]` / `dist[i, j]` que os solvers já usam.
+    """
+
+    def __init__(
+        self,
+        cities: list[str],
+        holiday_matrix: np.ndarray,
+        distance_matrix: np.ndarray,
+        distance_rows: np.ndarray,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        selection: np.ndarray | None = None,
+    ) -> None:
+        self.cities = cities
+        self.holiday_matrix = holiday_matrix
+        self.distance_matrix = distance_matrix
+        self.distance_rows = distance_rows
+        self.lat = lat
+        self.lon = lon
+        self.selection = np.arange(len(cities)) if selection is None else selection
+
+        self.N = [cities[i] for i in self.selection]
+        self.T = list(range(holiday_matrix.shape[1]))
+        self.holidays = HolidayMatrix(holiday_matrix, self.N, self.selection)
+        self.distances = DistanceMatrix(distance_matrix, self.N, distance_rows[self.selection])
+
+    @classmethod
+    def from_holidays(
+        cls,
+        holidays: list[HolidayData] | HolidayIndex,
+        start_date: str,
+        end_date: str,
+        distance_cache: DistanceMatrix | None = None,
+    ) -> "TEPInstance":
+        """Mesma instância de `build_tep_inputs`, montada direto nos arrays."""
+        window = holidays_in_window(holidays, start_date, end_date)
+
+        coords: dict[str, tuple[float, float]] = {}
+        for h in window:
+            if h.city_name not in coords:
+                coords[h.city_name] = (h.lat, h.lon)
+        cities = sorted(coords)
+        position = {city: i for i, city in enumerate(cities)}
+
+        holiday_matrix = np.zeros((len(cities), len(window.dates)), dtype=np.uint8)
+        for t in range(len(window.dates)):
+            for h in window.rows[window.offsets[t]:window.offsets[t + 1]]:
+                holiday_matrix[position[h.city_name], t] = 1
+
+        lat = np.array([coords[c][0] for c in cities], dtype=np.float64)
+        lon = np.array([coords[c][1] for c in cities], dtype=np.float64)
+
+        # Com o cache, as distâncias são uma visão sobre a matriz de todas as cidades
+        if distance_cache is not None:
+            distance_matrix = distance_cache.matrix
+            distance_rows = distance_cache.indices(cities)
+        else:
+            distance_matrix = haversine_matrix(lat, lon)
+            distance_rows = np.arange(len(cities))
+
+        return cls(cities, holiday_matrix, distance_matrix, distance_rows, lat, lon)
+
+    def restrict(self, cities: list[str]) -> "TEPInstance":
+        """Sub-instância com as cidades pedidas (na ordem dada), compartilhando os arrays."""
+        position = {city: i for i, city in enumerate(self.cities)}
+        selection = np.array([position[city] for city in cities], dtype=np.int64)
+        return TEPInstance(
+            self.cities,
+            self.holiday_matrix,
+            self.distance_matrix,
+            self.distance_rows,
+            self.lat,
+            self.lon,
+            selection,
+        )
+
+    @property
+    def city_coordinates(self) -> dict[str, dict[str, float]]:
+        return {
+            self.cities[i]: {"name": self.cities[i], "lat": float(self.lat[i]), "lon": float(self.lon[i])}
+            for i in self.selection
+        }
+
+    def inputs(self):
+        """(N, T, holidays, distances, city_coordinates), como `build_tep_inputs`."""
+        return self.N, self.T, self.holidays, self.distances, self.city_coordinates
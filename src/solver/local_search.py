@@ -0,0 +1,238 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.profiling import profiler, stage
+from src.solver.dp_solver import layer_cities
+from src.solver.other_strategies import solve_tep_greedy
+from src.solver.pre_processing import DistanceMatrix, plan_cost, solution_stats
+
+
+class LocalSearchInstance:
+    """
+    Camadas do TEP com as cidades trocadas por ids locais e uma matriz de
+    distâncias compacta entre as cidades que aparecem em alguma camada, para
+    que os movimentos trabalhem só com arrays (e o pool receba uma cópia só).
+    """
+
+    def __init__(self, N, T, holidays, distances) -> None:
+        layers = layer_cities(N, T, holidays)
+        for time_idx, cities in zip(T, layers):
+            if not cities:
+                raise RuntimeError(f"Local search infeasible: no holiday city at time {time_idx}")
+
+        self.cities = sorted({city for cities in layers for city in cities})
+        self.city_id = {city: k for k, city in enumerate(self.cities)}
+        self.layers = [np.array([self.city_id[city] for city in cities], dtype=np.int64) for cities in layers]
+        self.layer_sets = [set(layer.tolist()) for layer in self.layers]
+
+        if isinstance(distances, DistanceMatrix):
+            self.D = distances.block(self.cities, self.cities)
+        else:
+            self.D = np.array([[distances[i, j] for j in self.cities] for i in self.cities], dtype=np.float64)
+
+    def encode(self, plan: list[str]) -> np.ndarray:
+        if len(plan) != len(self.layers):
+            raise ValueError(f"Plan has {len(plan)} days, expected {len(self.layers)}")
+        ids = np.array([self.city_id.get(city, -1) for city in plan], dtype=np.int64)
+        for t, city in enumerate(ids.tolist()):
+            if city not in self.layer_sets[t]:
+                raise ValueError(f"Plan visits {plan[t]} at time {t} without a holiday")
+        return ids
+
+    def decode(self, plan: np.ndarray) -> list[str]:
+        return [self.cities[k] for k in plan.tolist()]
+
+    def cost(self, plan: np.ndarray) -> float:
+        return float(self.D[plan[:-1], plan[1:]].astype(np.float64).sum())
+
+    def reoptimize_segment(self, plan: np.ndarray, a: int, b: int) -> tuple[float, np.ndarray]:
+        """
+        Melhor escolha de cidades para os dias a..b com plan[a - 1] e plan[b + 1]
+        fixos (DP no trecho). Retorna (delta de custo, novas cidades do trecho);
+        só os arcos que tocam o trecho entram na conta.
+        """
+        D = self.D
+        layer = self.layers[a]
+        cost = D[plan[a - 1], layer].astype(np.float64) if a > 0 else np.zeros(len(layer))
+
+        backpointers = []
+        for t in range(a + 1, b + 1):
+            total = cost[:, None] + D[np.ix_(self.layers[t - 1], self.layers[t])]
+            best_prev = total.argmin(axis=0)
+            cost = total[best_prev, np.arange(total.shape[1])]
+            backpointers.append(best_prev)
+        if b + 1 < len(plan):
+            cost = cost + D[self.layers[b], plan[b + 1]]
+
+        k = int(cost.argmin())
+        new_cost = float(cost[k])
+        positions = [k]
+        for best_prev in reversed(backpointers):
+            k = int(best_prev[k])
+            positions.append(k)
+        positions.reverse()
+        segment = np.array([self.layers[a + t][k] for t, k in enumerate(positions)], dtype=np.int64)
+
+        first, last = max(a - 1, 0), min(b + 1, len(plan) - 1)
+        old_cost = float(D[plan[first:last], plan[first + 1:last + 1]].astype(np.float64).sum())
+        return new_cost - old_cost, segment
+
+def descend(
+    instance: LocalSearchInstance,
+    plan: np.ndarray,
+    rng: np.random.Generator,
+    max_segment: int,
+    deadline: float,
+) -> tuple[np.ndarray, float, list[tuple[float, float]]]:
+    """
+    Re-otimiza trechos de até `max_segment` dias, com inícios em ordem aleatória,
+    até uma passada inteira não melhorar nada (ótimo local) ou acabar o tempo.
+    Retorna o plano, o custo e as melhorias (instante, custo).
+    """
+    plan = plan.copy()
+    cost = instance.cost(plan)
+    improvements = []
+    n_days = len(plan)
+    segment = min(max_segment, n_days)
+
+    improved = True
+    while improved and time.time() < deadline:
+        improved = False
+        for a in rng.permutation(n_days - segment + 1).tolist():
+            if time.time() >= deadline:
+                break
+            delta, new_segment = instance.reoptimize_segment(plan, a, a + segment - 1)
+            if delta < -1e-9:
+                plan[a:a + segment] = new_segment
+                cost += delta
+                improvements.append((time.time(), cost))
+                improved = True
+    return plan, cost, improvements
+
+def perturb(instance: LocalSearchInstance, plan: np.ndarray, rng: np.random.Generator, days: int) -> np.ndarray:
+    """Troca as cidades de um trecho aleatório de `days` dias por cidades com feriado sorteadas."""
+    plan = plan.copy()
+    days = min(days, len(plan))
+    a = int(rng.integers(0, len(plan) - days + 1))
+    for t in range(a, a + days):
+        plan[t] = instance.layers[t][rng.integers(len(instance.layers[t]))]
+    return plan
+
+def run_restart(
+    instance: LocalSearchInstance,
+    initial: np.ndarray,
+    restart: int,
+    seed: int,
+    max_segment: int,
+    perturb_days: int,
+    patience: int,
+    deadline: float,
+) -> dict:
+    """
+    Um recomeço (busca local iterada): o 0 desce a partir do plano dado, os outros
+    de uma perturbação dele; depois perturba o melhor ótimo local e desce de novo,
+    até `patience` rodadas seguidas sem melhora ou o fim do tempo.
+    """
+    rng = np.random.default_rng([seed, restart])
+    plan = initial if restart == 0 else perturb(instance, initial, rng, perturb_days)
+    best, best_cost, improvements = descend(instance, plan, rng, max_segment, deadline)
+
+    rounds_without_improvement = 0
+    while rounds_without_improvement < patience and time.time() < deadline:
+        plan, cost, _ = descend(instance, perturb(instance, best, rng, perturb_days), rng, max_segment, deadline)
+        if cost < best_cost - 1e-9:
+            best, best_cost = plan, cost
+            improvements.append((time.time(), cost))
+            rounds_without_improvement = 0
+        else:
+            rounds_without_improvement += 1
+
+    return {"restart": restart, "plan": best, "obj_val": best_cost, "improvements": improvements}
+
+# Instância de cada processo do pool (ver `improve_plan`)
+_worker_instance: LocalSearchInstance | None = None
+
+
+def _init_worker(instance: LocalSearchInstance) -> None:
+    global _worker_instance
+    _worker_instance = instance
+
+def _run_worker_restart(*args) -> dict:
+    return run_restart(_worker_instance, *args)
+
+def improve_plan(
+    N,
+    T,
+    holidays,
+    distances,
+    plan: list[str],
+    time_budget_s: float = 10.0,
+    restarts: int | None = None,
+    workers: int | None = None,
+    max_segment: int = 6,
+    perturb_days: int | None = None,
+    patience: int = 20,
+    seed: int = 0,
+) -> tuple[list[str], dict]:
+    """
+    Melhora um plano (ex.: guloso) por busca local: cada movimento re-escolhe as
+    cidades de um trecho de dias com a DP, avaliando só a variação de custo do
+    trecho. Os recomeços aleatórios (ver `run_restart`) rodam em um pool de
+    `workers` processos (1 = no próprio processo) e todos param em
+    `time_budget_s` segundos.
+    Retorna o melhor plano com o mesmo contrato (plan, stats) de `solve_tep`;
+    `stats["trace"]` traz cada melhoria (tempo, custo, recomeço).
+    """
+    start = time.time()
+    deadline = start + time_budget_s
+    profile_mark = profiler.mark()
+
+    with stage("improve_plan.instance"):
+        instance = LocalSearchInstance(N, T, holidays, distances)
+    initial = instance.encode(plan)
+    initial_cost = instance.cost(initial)
+
+    workers = workers or os.cpu_count() or 1
+    restarts = restarts or workers
+    perturb_days = perturb_days or 2 * max_segment
+    args = [(initial, restart, seed, max_segment, perturb_days, patience, deadline) for restart in range(restarts)]
+
+    with stage("improve_plan.restarts"):
+        if workers == 1 or restarts == 1:
+            results = [run_restart(instance, *restart_args) for restart_args in args]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(instance,)) as pool:
+                results = list(pool.map(_run_worker_restart, *zip(*args)))
+
+    best = min(results, key=lambda result: result["obj_val"])
+    chosen = instance.decode(best["plan"]) if initial_cost > best["obj_val"] else list(plan)
+
+    trace = sorted(
+        (
+            {"time_s": at - start, "obj_val": cost, "restart": result["restart"]}
+            for result in results
+            for at, cost in result["improvements"]
+        ),
+        key=lambda entry: entry["time_s"],
+    )
+
+    stats = solution_stats(
+        N, T, chosen, plan_cost(chosen, distances), time.time() - start,
+        initial_obj_val=plan_cost(plan, distances),
+        mip_gap=None,
+        restarts=restarts,
+        workers=workers,
+        best_restart=best["restart"],
+        improvements=len(trace),
+        trace=trace,
+    )
+    if profiler.enabled:
+        stats["stages"] = profiler.stages_since(profile_mark)
+
+    return chosen, stats
+
+def solve_tep_local_search(N, T, holidays, distances, **kwargs) -> tuple[list[str], dict]:
+    """Busca local a partir do plano guloso, com o contrato (plan, stats) de `solve_tep`."""
+    plan, _ = solve_tep_greedy(N, T, holidays, distances)
+    return improve_plan(N, T, holidays, distances, plan, **kwargs)
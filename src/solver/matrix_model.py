@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+import numpy as np
+import scipy.sparse as sp
+from src.solver.dp_solver import layer_cities, layer_distances
+from src.solver.pre_processing import PrunedArcs
+
+
+def sparse_arc_arrays(distances, layers) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Numbers the (city, day) cells layer by layer and returns the cell offsets of
+    each layer plus the departure cell, arrival cell and cost of every usable arc.
+    """
+    sizes = np.array([len(cities) for cities in layers], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+    arc_from, arc_to, arc_cost = [], [], []
+    for idx in range(len(layers) - 1):
+        n_from, n_to = sizes[idx], sizes[idx + 1]
+        arc_from.append(offsets[idx] + np.repeat(np.arange(n_from), n_to))
+        arc_to.append(offsets[idx + 1] + np.tile(np.arange(n_to), n_from))
+        arc_cost.append(layer_distances(distances, layers[idx], layers[idx + 1]).ravel())
+
+    if not arc_from:
+        empty = np.zeros(0, dtype=np.int64)
+        return offsets, empty, empty, np.zeros(0)
+    return offsets, np.concatenate(arc_from), np.concatenate(arc_to), np.concatenate(arc_cost)
+
+@dataclass
+class TEPMatrixModel:
+    """
+    Sparse TEP formulation as `min c·z  s.t.  A z = b, z ∈ {0, 1}`, with
+    z = [x (one variable per holiday cell), y (one per usable arc)].
+    """
+
+    layers: list[list[str]]
+    offsets: np.ndarray     # x[offsets[t]:offsets[t + 1]] are the cities of layers[t]
+    arc_from: np.ndarray
+    arc_to: np.ndarray
+    c: np.ndarray
+    A: sp.csr_matrix
+    b: np.ndarray
+
+    @property
+    def n_cells(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def n_arcs(self) -> int:
+        return len(self.arc_from)
+
+    def read_plan(self, z: np.ndarray) -> list[str]:
+        """City with the largest x in each layer."""
+        return [
+            cities[int(z[self.offsets[idx]:self.offsets[idx + 1]].argmax())]
+            for idx, cities in enumerate(self.layers)
+        ]
+
+    def plan_vector(self, plan: list[str]) -> np.ndarray:
+        """The z vector (x and y) of a plan, e.g. as a starting solution."""
+        if len(plan) != len(self.layers):
+            raise ValueError(f"Plan has {len(plan)} days, expected {len(self.layers)}")
+        # list.index raises ValueError for a city without a holiday (or pruned) on that day
+        cells = [int(self.offsets[idx]) + cities.index(city) for idx, (cities, city) in enumerate(zip(self.layers, plan))]
+
+        # Arcs are sorted by (departure, arrival) cell
+        keys = self.arc_from * self.n_cells + self.arc_to
+        wanted = np.array([i * self.n_cells + j for i, j in zip(cells, cells[1:])], dtype=np.int64)
+        arcs = np.searchsorted(keys, wanted)
+        if len(wanted) and (arcs.max() >= len(keys) or (keys[arcs] != wanted).any()):
+            raise ValueError("Plan uses an arc that is not in the model (pruned)")
+
+        z = np.zeros(self.n_cells + self.n_arcs)
+        z[cells] = 1
+        z[self.n_cells + arcs] = 1
+        return z
+
+def build_tep_matrix_model(N, T, holidays, distances, pruned: PrunedArcs | None = None) -> TEPMatrixModel:
+    """
+    Assembles c, A and b with array operations only (no per-variable or
+    per-constraint objects). With `pruned` (see `prune_arcs`) only the cells and
+    arcs that survived the pruning become variables.
+    """
+    if pruned is not None:
+        layers, offsets = pruned.layers, pruned.offsets
+        arc_from, arc_to, arc_cost = pruned.arc_from, pruned.arc_to, pruned.arc_cost
+    else:
+        layers = layer_cities(N, T, holidays)
+        offsets, arc_from, arc_to, arc_cost = sparse_arc_arrays(distances, layers)
+    n_cells, n_arcs = int(offsets[-1]), len(arc_cost)
+    cell_time = np.repeat(np.arange(len(layers)), np.diff(offsets))
+    cells, arcs = np.arange(n_cells), np.arange(n_arcs)
+
+    # one_city_day: each layer sums to 1
+    one_city_day = sp.csr_matrix((np.ones(n_cells), (cell_time, cells)), shape=(len(layers), n_cells))
+    blocks = [[one_city_day, sp.csr_matrix((len(layers), n_arcs))]]
+
+    # depart/arrive: the arcs leaving (entering) a cell sum to its x
+    depart_cells = np.flatnonzero(cell_time < len(layers) - 1)
+    arrive_cells = np.flatnonzero(cell_time > 0)
+    departures = sp.csr_matrix((np.ones(n_arcs), (arc_from, arcs)), shape=(n_cells, n_arcs))
+    arrivals = sp.csr_matrix((np.ones(n_arcs), (arc_to, arcs)), shape=(n_cells, n_arcs))
+    identity = sp.identity(n_cells, format="csr")
+    blocks.append([-identity[depart_cells], departures[depart_cells]])
+    blocks.append([-identity[arrive_cells], arrivals[arrive_cells]])
+
+    A = sp.bmat(blocks, format="csr")
+    b = np.concatenate((np.ones(len(layers)), np.zeros(len(depart_cells) + len(arrive_cells))))
+    c = np.concatenate((np.zeros(n_cells), arc_cost.astype(np.float64, copy=False)))
+
+    return TEPMatrixModel(layers, offsets, arc_from, arc_to, c, A, b)
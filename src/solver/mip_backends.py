@@ -0,0 +1,169 @@
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from src.profiling import profiler, stage
+from src.solver.matrix_model import build_tep_matrix_model
+from src.solver.pre_processing import PrunedArcs, solution_stats
+
+TIME_LIMIT_S = 600
+
+
+@lru_cache(maxsize=None)
+def gurobi_available() -> bool:
+    """
+    True if gurobipy imports and a Gurobi environment (i.e. a license) can be
+    opened. Checked once per process.
+    """
+    try:
+        import gurobipy as gp
+        with gp.Env(params={"OutputFlag": 0}):
+            return True
+    except Exception:
+        return False
+
+class MIPBackend(ABC):
+    """
+    A MIP solver for the TEP. `solve` has the contract of `solve_tep`:
+    (N, T, holidays, distances) -> (plan, stats), with the same stats keys.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def available(self) -> bool:
+        """True if the backend can solve on this machine."""
+
+    @abstractmethod
+    def solve(
+        self,
+        N,
+        T,
+        holidays,
+        distances,
+        initial_plan: list[str] | None = None,
+        mip_gap: float | None = None,
+        threads: int | None = None,
+        pruned: PrunedArcs | None = None,
+    ) -> tuple[list[str], dict]:
+        """Solves the TEP; `pruned` (see `prune_arcs`) restricts the model to the surviving arcs."""
+
+class GurobiBackend(MIPBackend):
+    """`solve_tep` with the matrix formulation."""
+
+    name = "gurobi"
+
+    def available(self) -> bool:
+        return gurobi_available()
+
+    def solve(self, N, T, holidays, distances, initial_plan=None, mip_gap=None, threads=None, pruned=None):
+        # Imported here so this module loads on machines without gurobipy
+        from src.solver.solver import solve_tep
+
+        plan, stats = solve_tep(
+            N, T, holidays, distances,
+            matrix=True, initial_plan=initial_plan, mip_gap=mip_gap, threads=threads, pruned=pruned,
+        )
+        stats["backend"] = self.name
+        return plan, stats
+
+class ScipyBackend(MIPBackend):
+    """
+    The same sparse formulation solved by `scipy.optimize.milp` (HiGHS), which
+    needs no license. HiGHS through SciPy takes no MIP start or thread count,
+    so `initial_plan` is only validated and `threads` is ignored.
+    """
+
+    name = "scipy"
+
+    def available(self) -> bool:
+        return True
+
+    def solve(self, N, T, holidays, distances, initial_plan=None, mip_gap=None, threads=None, pruned=None):
+        profile_mark = profiler.mark()
+        build_start = time.perf_counter()
+        with stage("scipy.build"):
+            model = build_tep_matrix_model(N, T, holidays, distances, pruned)
+        build_time = time.perf_counter() - build_start
+
+        if initial_plan is not None:
+            model.plan_vector(initial_plan)  # raises if the plan leaves the holiday cells or pruned arcs
+
+        n_vars = len(model.c)
+        options = {"time_limit": TIME_LIMIT_S, "disp": False}
+        if mip_gap is not None:
+            options["mip_rel_gap"] = mip_gap
+
+        start = time.perf_counter()
+        if n_vars:
+            with stage("scipy.optimize"):
+                result = milp(
+                    model.c,
+                    constraints=LinearConstraint(model.A, model.b, model.b),
+                    integrality=np.ones(n_vars),
+                    bounds=Bounds(0, 1),
+                    options=options,
+                )
+            # 0: optimal, 1: iteration/time limit (with an incumbent if x is set)
+            if result.status not in (0, 1) or result.x is None:
+                raise RuntimeError(f"MIP ended with status {result.status}: {result.message}")
+            chosen = model.read_plan(result.x)
+            obj_val = float(result.fun)
+            mip_gap_final = getattr(result, "mip_gap", None)
+            node_count = getattr(result, "mip_node_count", None)
+        else:
+            chosen, obj_val, mip_gap_final, node_count = [], 0.0, 0.0, 0
+        runtime = time.perf_counter() - start
+
+        stats = solution_stats(
+            N, T, chosen, obj_val, runtime,
+            build_time_s=build_time,
+            mip_gap=mip_gap_final,
+            num_vars=n_vars,
+            num_bin_vars=n_vars,
+            num_constrs=model.A.shape[0],
+            node_count=node_count,
+            formulation="matrix",
+            warm_start=False,
+            incumbent_trajectory=[],
+            backend=self.name,
+            pruned_arcs=pruned.removed_arcs if pruned is not None else None,
+            pruned_fraction=pruned.removed_fraction if pruned is not None else None,
+        )
+        if profiler.enabled:
+            stats["stages"] = profiler.stages_since(profile_mark)
+
+        return chosen, stats
+
+BACKENDS: dict[str, MIPBackend] = {
+    "gurobi": GurobiBackend(),
+    "scipy": ScipyBackend(),
+}
+
+def get_backend(name: str | None = None) -> MIPBackend:
+    """The backend called `name`; with `None`, Gurobi if it has a license, otherwise SciPy."""
+    if name is not None:
+        if name not in BACKENDS:
+            raise ValueError(f"unknown MIP backend {name!r}, expected one of {tuple(BACKENDS)}")
+        return BACKENDS[name]
+    for backend in BACKENDS.values():
+        if backend.available():
+            return backend
+    raise RuntimeError("no MIP backend available")
+
+def solve_tep_mip(
+    N,
+    T,
+    holidays,
+    distances,
+    backend: str | None = None,
+    initial_plan: list[str] | None = None,
+    mip_gap: float | None = None,
+    threads: int | None = None,
+    pruned: PrunedArcs | None = None,
+) -> tuple[list[str], dict]:
+    """`solve_tep` on a pluggable backend (see `BACKENDS`); `pruned` comes from `prune_arcs`."""
+    return get_backend(backend).solve(
+        N, T, holidays, distances, initial_plan=initial_plan, mip_gap=mip_gap, threads=threads, pruned=pruned
+    )
@@ -1,30 +1,82 @@
-from datetime import datetime
+import time
+from collections import OrderedDict
+from datetime import date
+import numpy as np
+from scipy.spatial import cKDTree
 from src.data_types import HolidayData
-from src.solver.pre_processing import haversine2km
+from src.holiday_index import HolidayIndex, holidays_in_window
+from src.profiling import profiled
+from src.solver.dp_solver import layer_cities, layer_distances
+from src.solver.pre_processing import haversine2km, solution_stats, unit_sphere_xyz
+
+
+class DayNeighborIndex:
+    """
+    Índice espacial por dia: uma KD-tree sobre as coordenadas 3D (esfera unitária)
+    das cidades candidatas do dia, construída na primeira consulta e reutilizada
+    nas seguintes. Se as candidatas do dia mudarem (ex.: outro subconjunto de
+    cidades), a árvore do dia é refeita. Guarda no máximo `max_days` árvores
+    (as usadas há mais tempo saem primeiro).
+    """
+
+    # Abaixo disso a busca linear com haversine é mais barata que a árvore
+    MIN_TREE_SIZE = 32
+
+    def __init__(self, city_coords: dict[str, dict[str, float]], max_days: int = 512) -> None:
+        self.city_coords = city_coords
+        self.max_days = max_days
+        self._trees: OrderedDict[date, tuple[cKDTree, list[HolidayData]]] = OrderedDict()
+
+    def _tree(self, day: date, candidates: list[HolidayData]) -> tuple[cKDTree, list[HolidayData]]:
+        cached = self._trees.get(day)
+        # As linhas vêm do mesmo índice, então a comparação das listas para na identidade (em C)
+        if cached is not None and cached[1] == candidates:
+            self._trees.move_to_end(day)
+            return cached
+
+        lat = [self.city_coords[h.city_name]["lat"] for h in candidates]
+        lon = [self.city_coords[h.city_name]["lon"] for h in candidates]
+        self._trees[day] = (cKDTree(unit_sphere_xyz(lat, lon)), list(candidates))
+        self._trees.move_to_end(day)
+        while len(self._trees) > self.max_days:
+            self._trees.popitem(last=False)
+        return self._trees[day]
+
+    def nearest(self, day: date, candidates: list[HolidayData], city: str) -> HolidayData:
+        """Cidade com feriado em `day` mais próxima de `city`."""
+        coords = self.city_coords[city]
+
+        if len(candidates) < self.MIN_TREE_SIZE:
+            return min(
+                candidates,
+                key=lambda h: haversine2km(
+                    coords["lat"], coords["lon"],
+                    self.city_coords[h.city_name]["lat"],
+                    self.city_coords[h.city_name]["lon"],
+                )
+            )
+
+        tree, tree_candidates = self._tree(day, candidates)
+        _, k = tree.query(unit_sphere_xyz(coords["lat"], coords["lon"]))
+        return tree_candidates[int(k)]
 
 
+@profiled("solve_tsp_naive")
 def solve_tsp_naive(
-    holidays: list[HolidayData],
+    holidays: list[HolidayData] | HolidayIndex,
     start_date: str,
     end_date: str,
     city_coords: dict[str, dict[str, float]]
 ) -> tuple[list[str], float]:
     """Retorna uma solução simples (não ótima) para o TSP."""
 
-    start_date_formatted = datetime.fromisoformat(start_date).date()
-    end_date_formatted = datetime.fromisoformat(end_date).date()
-
     # Filtra feriados dentro do intervalo
-    filtered = [
-        h for h in holidays
-        if start_date_formatted <= h.date < end_date_formatted
-    ]
+    window = holidays_in_window(holidays, start_date, end_date)
 
     # Seleciona exatamente 1 feriado por dia (o primeiro)
-    days_sorted = sorted({h.day_of_year for h in filtered})
     holiday_for_day = [
-        next(h for h in filtered if h.day_of_year == day)
-        for day in days_sorted
+        window.rows[window.offsets[pos]]
+        for pos in range(len(window.dates))
     ]
 
     # Extrai o nome das cidades em ordem
@@ -40,26 +92,30 @@ def solve_tsp_naive(
 
     return solution, cost
 
+@profiled("solve_tsp_greedy")
 def solve_tsp_greedy(
-    holidays: list[HolidayData],
+    holidays: list[HolidayData] | HolidayIndex,
     start_date: str,
     end_date: str,
-    city_coords: dict[str, dict[str, float]]
+    city_coords: dict[str, dict[str, float]],
+    origin: str | None = None,
+    neighbor_index: DayNeighborIndex | None = None,
 ) -> tuple[list[str], float]:
-    """Solução gulosa: para cada dia escolhe a cidade com feriado mais próxima da cidade anterior."""
+    """
+    Solução gulosa: para cada dia escolhe a cidade com feriado mais próxima da cidade anterior.
+    `origin` é a cidade de partida (o primeiro dia fica na cidade com feriado mais próxima dela);
+    passe o mesmo `neighbor_index` para reaproveitar as árvores entre várias execuções.
+    """
 
-    start_date_formatted = datetime.fromisoformat(start_date).date()
-    end_date_formatted = datetime.fromisoformat(end_date).date()
+    if origin is not None and origin not in city_coords:
+        raise ValueError(f"Unknown origin city {origin!r}: it has no coordinates")
 
-    filtered = [
-        h for h in holidays
-        if start_date_formatted <= h.date < end_date_formatted
-    ]
+    window = holidays_in_window(holidays, start_date, end_date)
 
-    days_sorted = sorted({h.day_of_year for h in filtered})
+    days_sorted = window.dates
 
-    cities_by_day: dict[int, list[HolidayData]] = {
-        day: [h for h in filtered if h.day_of_year == day]
+    cities_by_day: dict[date, list[HolidayData]] = {
+        day: window.on_date(day)
         for day in days_sorted
     }
 
@@ -67,22 +123,18 @@ def solve_tsp_greedy(
     cost = 0.0
 
 
+    if neighbor_index is None:
+        neighbor_index = DayNeighborIndex(city_coords)
+
     first_day = days_sorted[0]
-    current_city = cities_by_day[first_day][0].city_name
+    if origin is None:
+        current_city = cities_by_day[first_day][0].city_name
+    else:
+        current_city = neighbor_index.nearest(first_day, cities_by_day[first_day], origin).city_name
     solution.append(current_city)
 
     for day in days_sorted[1:]:
-        candidate_cities = cities_by_day[day]
-
-        best_city = min(
-            candidate_cities,
-            key=lambda h: haversine2km(
-                city_coords[current_city]["lat"],
-                city_coords[current_city]["lon"],
-                city_coords[h.city_name]["lat"],
-                city_coords[h.city_name]["lon"],
-            )
-        )
+        best_city = neighbor_index.nearest(day, cities_by_day[day], current_city)
 
         dist = haversine2km(
             city_coords[current_city]["lat"],
@@ -96,3 +148,27 @@ def solve_tsp_greedy(
         solution.append(current_city)
 
     return solution, cost
+
+def solve_tep_greedy(N, T, holidays, distances) -> tuple[list[str], dict]:
+    """
+    A mesma estratégia gulosa sobre as entradas do TEP (N, T, holidays, distances),
+    com o mesmo contrato (plan, stats) de `solve_tep`.
+    """
+    start = time.perf_counter()
+
+    layers = layer_cities(N, T, holidays)
+    solution: list[str] = []
+    cost = 0.0
+
+    if layers:
+        current = 0
+        solution.append(layers[0][current])
+        for idx in range(1, len(layers)):
+            d = layer_distances(distances, layers[idx - 1][current:current + 1], layers[idx])[0]
+            current = int(np.argmin(d))
+            cost += float(d[current])
+            solution.append(layers[idx][current])
+
+    stats = solution_stats(N, T, solution, cost, time.perf_counter() - start, mip_gap=None)
+
+    return solution, stats
@@ -1,7 +1,13 @@
 from src.data_types import HolidayData
-from datetime import datetime
+from src.holiday_index import HolidayIndex, holidays_in_window
+from src.profiling import profiled, stage
+from collections.abc import Mapping
+from dataclasses import dataclass
 from typing import List, Tuple
 import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
 
 
 def haversine2km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -15,25 +21,157 @@ def haversine2km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
     c = 2 * math.asin(math.sqrt(a))
     
-    r = 6371
+    r = EARTH_RADIUS_KM
     return c * r
 
+def plan_cost(plan: list[str], distances) -> float:
+    """Custo total (km) de um plano, somando as distâncias entre dias consecutivos."""
+    return float(sum(distances[a, b] for a, b in zip(plan, plan[1:])))
+
+def count_moves(plan: list[str]) -> int:
+    """Número de movimentos (mudança de cidade entre dias consecutivos)."""
+    return sum(1 for a, b in zip(plan, plan[1:]) if a != b)
+
+def solution_stats(N, T, plan: list[str], obj_val: float, runtime_s: float, **extra) -> dict:
+    """
+    Stats no contrato de `solve_tep`, comuns a todos os solvers; `extra` traz
+    as chaves próprias de cada um (mip_gap, num_vars, formulation, ...).
+    """
+    return {
+        "n_cities": len(N),
+        "n_days": len(T),
+        "obj_val": obj_val,
+        "runtime_s": runtime_s,
+        **extra,
+        "num_moves": count_moves(plan),
+        "plan": plan,
+    }
+
+def unit_sphere_xyz(lat, lon) -> np.ndarray:
+    """
+    Coordenadas 3D na esfera unitária. A distância euclidiana (corda) entre esses
+    pontos cresce junto com a distância de haversine, então serve para vizinhos mais próximos.
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+def haversine_matrix(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    dtype=np.float64,
+    chunk_size: int = 1024,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Matriz de distâncias (km) entre todas as coordenadas, calculada de forma
+    vetorizada em blocos de linhas para limitar a memória intermediária.
+    `out` permite escrever direto em um array já alocado (ex.: um memmap).
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    n = len(lat)
+    cos_lat = np.cos(lat)
+
+    distances = np.empty((n, n), dtype=dtype) if out is None else out
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        dlat = lat[None, :] - lat[start:stop, None]
+        dlon = lon[None, :] - lon[start:stop, None]
+        a = np.sin(dlat / 2) ** 2 + cos_lat[start:stop, None] * cos_lat[None, :] * np.sin(dlon / 2) ** 2
+        distances[start:stop] = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+class DistanceMatrix(Mapping):
+    """
+    Adaptador que expõe uma matriz densa de distâncias como o dicionário
+    `dist[i, j]` indexado pelo nome das cidades. Com `rows`, as cidades apontam
+    para essas linhas de uma matriz maior (uma visão, sem cópia).
+    """
+
+    def __init__(self, matrix: np.ndarray, cities: list[str], rows=None) -> None:
+        self.matrix = matrix
+        self.cities = list(cities)
+        rows = range(len(self.cities)) if rows is None else [int(row) for row in rows]
+        self.index = dict(zip(self.cities, rows))
+
+    def __getitem__(self, key: tuple[str, str]) -> float:
+        i, j = key
+        return float(self.matrix[self.index[i], self.index[j]])
+
+    def __iter__(self):
+        return ((i, j) for i in self.cities for j in self.cities)
+
+    def __len__(self) -> int:
+        return len(self.cities) ** 2
+
+    def __contains__(self, key) -> bool:
+        try:
+            i, j = key
+        except (TypeError, ValueError):
+            return False
+        return i in self.index and j in self.index
+
+    def indices(self, cities: list[str]) -> np.ndarray:
+        return np.array([self.index[city] for city in cities], dtype=np.int64)
+
+    def block(self, from_cities: list[str], to_cities: list[str]) -> np.ndarray:
+        """Submatriz de distâncias entre dois conjuntos de cidades."""
+        return self.matrix[np.ix_(self.indices(from_cities), self.indices(to_cities))]
+
+    def restrict(self, cities: list[str]) -> "DistanceMatrix":
+        """Nova `DistanceMatrix` só com as cidades pedidas, na ordem dada."""
+        return DistanceMatrix(self.block(cities, cities), cities)
+
+class HolidayMatrix(Mapping):
+    """
+    Adaptador que expõe uma matriz 0/1 (cidades × dias) como o dicionário
+    `holidays[city, t]`. Assim como `DistanceMatrix`, aceita `rows` para ser
+    uma visão sobre as linhas de uma matriz maior.
+    """
+
+    def __init__(self, matrix: np.ndarray, cities: list[str], rows=None) -> None:
+        self.matrix = matrix
+        self.cities = list(cities)
+        rows = range(len(self.cities)) if rows is None else [int(row) for row in rows]
+        self.index = dict(zip(self.cities, rows))
+
+    def __getitem__(self, key: tuple[str, int]) -> int:
+        city, t = key
+        return int(self.matrix[self.index[city], t])
+
+    def __iter__(self):
+        return ((city, t) for city in self.cities for t in range(self.matrix.shape[1]))
+
+    def __len__(self) -> int:
+        return len(self.cities) * self.matrix.shape[1]
+
+    def indices(self, cities: list[str]) -> np.ndarray:
+        return np.array([self.index[city] for city in cities], dtype=np.int64)
+
+@profiled("build_tep_inputs")
 def build_tep_inputs(
-    holidays: List[HolidayData],
+    holidays: List[HolidayData] | HolidayIndex,
     start_date: str,
     end_date: str,
+    as_matrix: bool = False,
+    dtype=np.float64,
+    distance_cache: DistanceMatrix | None = None,
 ) -> Tuple[list, list[int], dict[tuple[str, int], int], dict[tuple[str, str], float], dict]:
+    """
+    Monta as entradas do TEP. Com `as_matrix=True` as distâncias são uma
+    `DistanceMatrix` (matriz NumPy densa + índice cidade→linha) em vez de um dict.
+    Com `distance_cache` (ver `distance_cache.cached_distance_matrix`) as
+    distâncias são recortadas da matriz de todas as cidades, sem recalcular nada.
+    """
 
-    start_date_formatted = datetime.fromisoformat(start_date).date()
-    end_date_formatted = datetime.fromisoformat(end_date).date()
-
-    filtered = [
-        h for h in holidays
-        if start_date_formatted <= h.date < end_date_formatted
-    ]
+    window = holidays_in_window(holidays, start_date, end_date)
+    filtered = window.rows
 
     # 2. Conjunto de datas ordenadas
-    dates_sorted = sorted({h.date for h in filtered})
+    dates_sorted = window.dates
     T = list(range(len(dates_sorted)))
     date_to_t = {d: t for t, d in enumerate(dates_sorted)}
 
@@ -58,18 +196,159 @@ def build_tep_inputs(
             }
 
     # 6. Distâncias haversine entre todas as cidades
-    distances = {
-        (i, j): (
-            0.0 if i == j else haversine2km(
-                city_coords[i]["lat"], city_coords[i]["lon"],
-                city_coords[j]["lat"], city_coords[j]["lon"]
+    if distance_cache is not None:
+        return N, T, holidays_map, distance_cache.restrict(N), city_coords
+
+    if as_matrix:
+        lat = np.array([city_coords[i]["lat"] for i in N])
+        lon = np.array([city_coords[i]["lon"] for i in N])
+        with stage("build_tep_inputs.distances"):
+            distances = DistanceMatrix(haversine_matrix(lat, lon, dtype=dtype), N)
+        return N, T, holidays_map, distances, city_coords
+
+    with stage("build_tep_inputs.distances"):
+        distances = {
+            (i, j): (
+                0.0 if i == j else haversine2km(
+                    city_coords[i]["lat"], city_coords[i]["lon"],
+                    city_coords[j]["lat"], city_coords[j]["lon"]
+                )
             )
-        )
-        for i in N
-        for j in N
-    }
+            for i in N
+            for j in N
+        }
 
     # # Metadados
     # meta = {"cities": N, "dates": dates_sorted}
 
-    return N, T, holidays_map, distances, city_coords
\ No newline at end of file
+    return N, T, holidays_map, distances, city_coords
+
+
+@dataclass
+class PrunedArcs:
+    """
+    Grafo do TEP depois de `prune_arcs`: as células (cidade, dia) e os arcos que
+    ainda podem estar em um plano ótimo. As células são numeradas camada a
+    camada (`layers[t]` ocupa `offsets[t]:offsets[t + 1]`) e cada arco guarda a
+    célula de partida, a de chegada e o custo, como em `sparse_arc_arrays`.
+    """
+
+    T: list[int]
+    layers: list[list[str]]
+    offsets: np.ndarray
+    arc_from: np.ndarray
+    arc_to: np.ndarray
+    arc_cost: np.ndarray
+    upper_bound: float
+    total_cells: int
+    total_arcs: int
+
+    @property
+    def n_cells(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def n_arcs(self) -> int:
+        return len(self.arc_from)
+
+    @property
+    def removed_cells(self) -> int:
+        return self.total_cells - self.n_cells
+
+    @property
+    def removed_arcs(self) -> int:
+        return self.total_arcs - self.n_arcs
+
+    @property
+    def removed_fraction(self) -> float:
+        """Fração dos arcos removida pela poda (0 quando não sobrou nada a podar)."""
+        return self.removed_arcs / self.total_arcs if self.total_arcs else 0.0
+
+    def cells(self) -> list[tuple[str, int]]:
+        """(cidade, t) de cada célula, na numeração das células."""
+        return [(city, self.T[idx]) for idx, cities in enumerate(self.layers) for city in cities]
+
+    def arcs(self) -> list[tuple[str, str, int]]:
+        """(i, j, t) de cada arco, como em `usable_arcs`."""
+        cells = self.cells()
+        return [
+            (cells[i][0], cells[j][0], cells[i][1])
+            for i, j in zip(self.arc_from.tolist(), self.arc_to.tolist())
+        ]
+
+    def contains_plan(self, plan: list[str]) -> bool:
+        """Se todos os arcos do plano sobreviveram à poda."""
+        positions = [{city: k for k, city in enumerate(cities)} for cities in self.layers]
+        try:
+            cells = [int(self.offsets[idx]) + positions[idx][city] for idx, city in enumerate(plan)]
+        except (KeyError, IndexError):
+            return False
+        kept = set(zip(self.arc_from.tolist(), self.arc_to.tolist()))
+        return all(arc in kept for arc in zip(cells, cells[1:]))
+
+@profiled("prune_arcs")
+def prune_arcs(N, T, holidays, distances, upper_bound: float | None = None) -> PrunedArcs:
+    """
+    Remove as células e arcos que não estão em nenhum plano de custo até
+    `upper_bound` (por padrão, o ótimo: sobram só os arcos de planos ótimos).
+    Com os custos exatos da DP em camadas,
+        forward[t][i]  = menor custo de um caminho do primeiro dia até i em t
+        backward[t][i] = menor custo de um caminho de i em t até o último dia,
+    o melhor plano que usa o arco (i em t, j em t + 1) custa exatamente
+    forward[t][i] + dist(i, j) + backward[t + 1][j]; o arco fica se isso não
+    passa de `upper_bound`. As distâncias são lidas camada a camada, em duas
+    passadas (ida e volta), sem guardar os blocos.
+    """
+    # Importado aqui: dp_solver importa este módulo
+    from src.solver.dp_solver import layer_cities, layer_distances
+
+    layers = layer_cities(N, T, holidays)
+    n = len(layers)
+    sizes = [len(cities) for cities in layers]
+    total_cells = sum(sizes)
+    total_arcs = sum(a * b for a, b in zip(sizes, sizes[1:]))
+
+    # 1ª passada (ida): forward[t]
+    forward = [np.zeros(size) for size in sizes]
+    for t in range(n - 1):
+        d = layer_distances(distances, layers[t], layers[t + 1])
+        forward[t + 1] = (forward[t][:, None] + d).min(axis=0)
+
+    optimum = float(forward[-1].min()) if n else 0.0
+    if upper_bound is None:
+        upper_bound = optimum
+    elif upper_bound < optimum - 1e-9 * max(1.0, abs(optimum)):
+        raise ValueError(f"upper_bound {upper_bound} is below the optimum {optimum}")
+    limit = upper_bound + 1e-9 * max(1.0, abs(upper_bound))
+
+    # 2ª passada (volta): backward[t] e, com ele, os arcos de t para t + 1.
+    # Um arco que fica tem as duas pontas dentro do limite, então basta filtrar os arcos.
+    backward = np.zeros(sizes[-1]) if n else np.zeros(0)
+    keep = [np.zeros(0, dtype=np.int64)] * n
+    if n:
+        keep[-1] = np.flatnonzero(forward[-1] + backward <= limit)
+    local_arcs = [None] * (n - 1)
+    for t in range(n - 2, -1, -1):
+        d = layer_distances(distances, layers[t], layers[t + 1])
+        bound = forward[t][:, None] + d + backward[None, :]
+        backward = (d + backward[None, :]).min(axis=1)
+        keep[t] = np.flatnonzero(forward[t] + backward <= limit)
+
+        rows, cols = np.nonzero(bound <= limit)
+        local_arcs[t] = (np.searchsorted(keep[t], rows), np.searchsorted(keep[t + 1], cols), d[rows, cols])
+
+    kept_layers = [[layers[t][k] for k in keep[t].tolist()] for t in range(n)]
+    offsets = np.concatenate(([0], np.cumsum([len(k) for k in keep]))).astype(np.int64)
+
+    empty = np.zeros(0, dtype=np.int64)
+    return PrunedArcs(
+        T=list(T),
+        layers=kept_layers,
+        offsets=offsets,
+        arc_from=np.concatenate([offsets[t] + rows for t, (rows, _, _) in enumerate(local_arcs)]) if local_arcs else empty,
+        arc_to=np.concatenate([offsets[t + 1] + cols for t, (_, cols, _) in enumerate(local_arcs)]) if local_arcs else empty,
+        arc_cost=np.concatenate([cost for _, _, cost in local_arcs]) if local_arcs else np.zeros(0),
+        upper_bound=float(upper_bound),
+        total_cells=total_cells,
+        total_arcs=total_arcs,
+    )
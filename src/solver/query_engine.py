@@ -0,0 +1,236 @@
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date
+import numpy as np
+from src.data_types import HolidayData
+from src.holiday_index import HolidayIndex, to_date
+from src.solver.dp_solver import layer_distances
+from src.solver.pre_processing import solution_stats
+
+
+def min_plus(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Produto (min, +) de matrizes, iterando na menor dimensão externa para limitar a memória."""
+    out = np.empty((a.shape[0], b.shape[1]))
+    if a.shape[0] <= b.shape[1]:
+        for i in range(a.shape[0]):
+            out[i, :] = (a[i][:, None] + b).min(axis=0)
+    else:
+        for k in range(b.shape[1]):
+            out[:, k] = (a + b[:, k][None, :]).min(axis=1)
+    return out
+
+def min_plus_identity(size: int) -> np.ndarray:
+    identity = np.full((size, size), np.inf)
+    np.fill_diagonal(identity, 0.0)
+    return identity
+
+class HolidayQueryEngine:
+    """
+    Responde consultas "melhor rota entre as datas A e B", com cidade de origem
+    e/ou destino opcionais, a partir de tabelas de DP pré-calculadas sobre as
+    camadas (dias com feriado) do ano inteiro.
+
+    As camadas são divididas em blocos de `block_size` dias e, em cada bloco, a
+    menor camada vira um checkpoint. Para cada checkpoint guardamos os custos
+    mínimos de/para todas as cidades das camadas vizinhas (tabelas backward e
+    forward) e, entre cada par de checkpoints, a matriz de custo do trecho. Uma
+    consulta que contém um checkpoint é respondida só com essas tabelas; as
+    curtas demais para conter um rodam a DP direta no trecho.
+    """
+
+    def __init__(
+        self,
+        holidays: list[HolidayData] | HolidayIndex,
+        distances,
+        block_size: int = 16,
+    ) -> None:
+        index = holidays if isinstance(holidays, HolidayIndex) else HolidayIndex(holidays)
+        self.dates: list[date] = index.dates
+        self.layers = [sorted({h.city_name for h in index.on_date(day)}) for day in self.dates]
+        self.positions = [{city: k for k, city in enumerate(layer)} for layer in self.layers]
+        self.blocks = [
+            layer_distances(distances, self.layers[t], self.layers[t + 1])
+            for t in range(len(self.layers) - 1)
+        ]
+
+        n = len(self.layers)
+        self.checkpoints = [
+            min(range(first, min(first + block_size, n)), key=lambda t: len(self.layers[t]))
+            for first in range(0, n, block_size)
+        ]
+
+        # back[i][t]: custo mínimo de cada cidade da camada t até cada cidade do checkpoint i
+        # fwd[i][t]: custo mínimo de cada cidade do checkpoint i até cada cidade da camada t
+        self.back: list[dict[int, np.ndarray]] = []
+        self.fwd: list[dict[int, np.ndarray]] = []
+        for i, c in enumerate(self.checkpoints):
+            prev_c = self.checkpoints[i - 1] if i > 0 else 0
+            next_c = self.checkpoints[i + 1] if i + 1 < len(self.checkpoints) else n - 1
+
+            back = {c: min_plus_identity(len(self.layers[c]))}
+            for t in range(c - 1, prev_c - 1, -1):
+                back[t] = min_plus(self.blocks[t], back[t + 1])
+            fwd = {c: min_plus_identity(len(self.layers[c]))}
+            for t in range(c + 1, next_c + 1):
+                fwd[t] = min_plus(fwd[t - 1], self.blocks[t - 1])
+
+            self.back.append(back)
+            self.fwd.append(fwd)
+
+        # Vetores "qualquer origem"/"qualquer destino" de cada camada, relativos ao
+        # primeiro checkpoint >= t e ao último checkpoint <= t
+        self.left_any: dict[int, np.ndarray] = {}
+        self.right_any: dict[int, np.ndarray] = {}
+        for t in range(n):
+            i = bisect_left(self.checkpoints, t)
+            if i < len(self.checkpoints):
+                self.left_any[t] = self.back[i][t].min(axis=0)
+            j = bisect_right(self.checkpoints, t) - 1
+            if j >= 0:
+                self.right_any[t] = self.fwd[j][t].min(axis=1)
+
+        # chain[i][j - i]: custo mínimo entre cidades do checkpoint i e do checkpoint j (j >= i)
+        self.chain: list[list[np.ndarray]] = []
+        for i in range(len(self.checkpoints)):
+            row = [min_plus_identity(len(self.layers[self.checkpoints[i]]))]
+            for j in range(i + 1, len(self.checkpoints)):
+                row.append(min_plus(row[-1], self.fwd[j - 1][self.checkpoints[j]]))
+            self.chain.append(row)
+
+    def layer_range(self, start_date: str | date, end_date: str | date) -> tuple[int, int]:
+        """Camadas [a, b] (inclusive) dos dias com feriado em `[start_date, end_date)`."""
+        a = bisect_left(self.dates, to_date(start_date))
+        b = bisect_left(self.dates, to_date(end_date)) - 1
+        return a, b
+
+    def _position(self, t: int, city: str | None) -> int | None:
+        return None if city is None else self.positions[t].get(city, -1)
+
+    def _segment_dp(self, a: int, b: int, origin: int | None, destination: int | None):
+        """DP direta sobre as camadas a..b; retorna (custo, posições do caminho)."""
+        cost = np.zeros(len(self.layers[a]))
+        if origin is not None:
+            cost = np.full(len(self.layers[a]), np.inf)
+            if origin >= 0:
+                cost[origin] = 0.0
+
+        backpointers = []
+        for t in range(a, b):
+            total = cost[:, None] + self.blocks[t]
+            best_prev = total.argmin(axis=0)
+            cost = total[best_prev, np.arange(total.shape[1])]
+            backpointers.append(best_prev)
+
+        if destination is None:
+            k = int(cost.argmin())
+        elif destination < 0:
+            return np.inf, None
+        else:
+            k = destination
+        if not np.isfinite(cost[k]):
+            return np.inf, None
+
+        path = [k]
+        for best_prev in reversed(backpointers):
+            k = int(best_prev[k])
+            path.append(k)
+        path.reverse()
+        return float(cost[path[-1]]), path
+
+    def _table_cost(self, a: int, b: int, origin: int | None, destination: int | None) -> float:
+        i = bisect_left(self.checkpoints, a)
+        j = bisect_right(self.checkpoints, b) - 1
+        if i > j:
+            return self._segment_dp(a, b, origin, destination)[0]
+        if (origin is not None and origin < 0) or (destination is not None and destination < 0):
+            return np.inf
+
+        left = self.left_any[a] if origin is None else self.back[i][a][origin]
+        right = self.right_any[b] if destination is None else self.fwd[j][b][:, destination]
+        return float((left[:, None] + self.chain[i][j - i] + right[None, :]).min())
+
+    def query_cost(
+        self,
+        start_date: str | date,
+        end_date: str | date,
+        origin: str | None = None,
+        destination: str | None = None,
+    ) -> float:
+        """Custo ótimo da janela; `inf` se a origem/destino não tem feriado no primeiro/último dia."""
+        a, b = self.layer_range(start_date, end_date)
+        if a > b:
+            return 0.0
+        return self._table_cost(a, b, self._position(a, origin), self._position(b, destination))
+
+    def query_costs(
+        self,
+        windows: list[tuple[str | date, str | date]],
+        origins: list[str | None] | None = None,
+        destinations: list[str | None] | None = None,
+    ) -> np.ndarray:
+        """Versão em lote de `query_cost`, vetorizada por par de checkpoints."""
+        origins = origins if origins is not None else [None] * len(windows)
+        destinations = destinations if destinations is not None else [None] * len(windows)
+        costs = np.zeros(len(windows))
+
+        groups: dict[tuple[int, int], list[tuple[int, np.ndarray, np.ndarray]]] = {}
+        for q, ((start_date, end_date), origin, destination) in enumerate(zip(windows, origins, destinations)):
+            a, b = self.layer_range(start_date, end_date)
+            if a > b:
+                continue
+            o, d = self._position(a, origin), self._position(b, destination)
+
+            i = bisect_left(self.checkpoints, a)
+            j = bisect_right(self.checkpoints, b) - 1
+            if i > j or (o is not None and o < 0) or (d is not None and d < 0):
+                costs[q] = self._table_cost(a, b, o, d)
+                continue
+
+            left = self.left_any[a] if o is None else self.back[i][a][o]
+            right = self.right_any[b] if d is None else self.fwd[j][b][:, d]
+            groups.setdefault((i, j), []).append((q, left, right))
+
+        for (i, j), queries in groups.items():
+            rows = np.array([q for q, _, _ in queries])
+            left = np.stack([l for _, l, _ in queries])
+            right = np.stack([r for _, _, r in queries])
+            total = left[:, :, None] + self.chain[i][j - i][None, :, :] + right[:, None, :]
+            costs[rows] = total.reshape(len(queries), -1).min(axis=1)
+
+        return costs
+
+    def query(
+        self,
+        start_date: str | date,
+        end_date: str | date,
+        origin: str | None = None,
+        destination: str | None = None,
+    ) -> tuple[list[str], dict]:
+        """
+        Plano ótimo da janela com o mesmo contrato (plan, stats) de `solve_tep`.
+        O custo vem das tabelas; o plano é reconstruído com a DP no trecho.
+        """
+        start = time.perf_counter()
+
+        a, b = self.layer_range(start_date, end_date)
+        chosen: list[str] = []
+        obj_val = 0.0
+        if a <= b:
+            o, d = self._position(a, origin), self._position(b, destination)
+            obj_val = self._table_cost(a, b, o, d)
+            if np.isfinite(obj_val):
+                _, path = self._segment_dp(a, b, o, d)
+                chosen = [self.layers[a + t][k] for t, k in enumerate(path)]
+
+        stats = solution_stats(
+            sorted({city for layer in self.layers[a:b + 1] for city in layer}),
+            self.dates[a:b + 1],
+            chosen,
+            obj_val,
+            time.perf_counter() - start,
+            mip_gap=0.0,
+            origin=origin,
+            destination=destination,
+        )
+
+        return chosen, stats
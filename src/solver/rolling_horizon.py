@@ -0,0 +1,106 @@
+import time
+from collections.abc import Callable
+from src.solver.dp_solver import solve_tep_dp
+from src.solver.pre_processing import plan_cost, solution_stats
+
+# Qualquer solver com o contrato de solve_tep: (N, T, holidays, distances) -> (plan, stats)
+WindowSolver = Callable[..., tuple[list[str], dict]]
+
+
+def window_instance(N, T, holidays, first: int, last: int, fixed_city: str | None):
+    """
+    Sub-instância com os dias T[first:last], reindexados a partir de 0. Com
+    `fixed_city`, o dia T[first] só permite essa cidade (o fim do prefixo já fixado).
+    Só entram as cidades com feriado em algum dia da janela.
+    """
+    days = T[first:last]
+    N_w = [city for city in N if any(holidays[city, t] for t in days)]
+    T_w = list(range(len(days)))
+
+    H_w = {}
+    for city in N_w:
+        for t_w, t in enumerate(days):
+            H_w[city, t_w] = holidays[city, t]
+    if fixed_city is not None:
+        for city in N_w:
+            H_w[city, 0] = 1 if city == fixed_city else 0
+
+    return N_w, T_w, H_w
+
+def solve_rolling_horizon(
+    N,
+    T,
+    holidays,
+    distances,
+    window: int = 14,
+    commit: int = 7,
+    solver: WindowSolver = solve_tep_dp,
+) -> tuple[list[str], dict]:
+    """
+    Resolve o TEP em janelas sobrepostas de `window` dias. De cada janela só os
+    primeiros `commit` dias são fixados; a janela seguinte começa no último dia
+    fixado, obrigada a partir da mesma cidade. A memória depende só de `window`.
+    """
+    if not 1 <= commit <= window:
+        raise ValueError("commit must be between 1 and window")
+
+    start = time.perf_counter()
+
+    plan: list[str] = []
+    windows = []
+    first = 0
+    while first < len(T):
+        last = min(first + window, len(T))
+
+        # A janela inclui o último dia já fixado para amarrar a continuidade
+        fixed_city = plan[-1] if plan else None
+        window_first = first - 1 if plan else first
+        N_w, T_w, H_w = window_instance(N, T, holidays, window_first, last, fixed_city)
+
+        window_plan, window_stats = solver(N_w, T_w, H_w, distances)
+        if plan:
+            window_plan = window_plan[1:]
+
+        committed = window_plan if last == len(T) else window_plan[:commit]
+        plan.extend(committed)
+
+        # Trecho não fixado da janela, a partir do último dia fixado
+        tail_first = first + len(committed) - 1
+        windows.append({
+            "first_t": T[first],
+            "last_t": T[last - 1],
+            "n_cities": len(N_w),
+            "committed_days": len(committed),
+            "window_obj": window_stats["obj_val"],
+            "window_runtime_s": window_stats["runtime_s"],
+            "planned_tail": window_plan[tail_first - first:],
+            "tail_first": tail_first,
+            "tail_last": last,
+        })
+
+        first += len(committed)
+
+    # Relatório de emenda: quanto o plano final pagou, nos dias da janela que não
+    # foram fixados, a mais do que a própria janela previa para eles
+    stitching_report = []
+    for entry in windows:
+        planned_tail = entry.pop("planned_tail")
+        realized_tail = plan[entry.pop("tail_first"):entry.pop("tail_last")]
+        entry["planned_tail_cost"] = plan_cost(planned_tail, distances)
+        entry["realized_tail_cost"] = plan_cost(realized_tail, distances)
+        entry["stitching_gap"] = entry["realized_tail_cost"] - entry["planned_tail_cost"]
+        stitching_report.append(entry)
+
+    runtime = time.perf_counter() - start
+
+    stats = solution_stats(
+        N, T, plan, plan_cost(plan, distances), runtime,
+        mip_gap=None,
+        n_windows=len(windows),
+        window_days=window,
+        commit_days=commit,
+        stitching_gap=sum(entry["stitching_gap"] for entry in stitching_report),
+        stitching_report=stitching_report,
+    )
+
+    return plan, stats
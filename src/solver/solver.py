@@ -1,6 +1,12 @@
 
+import time
+from contextlib import nullcontext
 import gurobipy as gp
 from gurobipy import GRB, Model
+from src.profiling import profiler, stage
+from src.solver.dp_solver import layer_cities
+from src.solver.matrix_model import TEPMatrixModel, build_tep_matrix_model
+from src.solver.pre_processing import PrunedArcs, solution_stats
 
 # Contraints
 def one_city_day_constraint(model: Model, x, T, N) -> None:
@@ -31,32 +37,200 @@ def block_arc_constraint(model: Model, y, T, N, holidays) -> None:
                     if holidays[departure_city, time] == 0 or holidays[arrival_city, time + 1] == 0:
                         model.addConstr(y[departure_city, arrival_city, time] == 0, name=f"block_arc[{departure_city},{arrival_city},{time}]")
            
-def solve_tep(N, T, holidays, distances) -> tuple[list[str], float]:
-    with gp.Env() as env, gp.Model(env=env) as model:
+# Sparse formulation
+def usable_arcs(T, layers) -> list[tuple[str, str, int]]:
+    """Arcs (i, j, t) with a holiday at i on day t and at j on day t + 1."""
+    return [
+        (departure_city, arrival_city, T[idx])
+        for idx in range(len(T) - 1)
+        for departure_city in layers[idx]
+        for arrival_city in layers[idx + 1]
+    ]
+
+def sparse_one_city_day_constraint(model: Model, x, T) -> None:
+    for time in T:
+        model.addConstr(x.sum("*", time) == 1, name=f"one_city_day[{time}]")
+
+def sparse_time_movement_consistency_departure_constraint(model: Model, x, y, T) -> None:
+    for (city, time) in x.keys():
+        if time != T[-1]:
+            model.addConstr(y.sum(city, "*", time) == x[city, time],
+                        name=f"depart[{city},{time}]")
+
+def sparse_time_movement_consistency_arrival_constraint(model: Model, x, y, T) -> None:
+    for (city, time) in x.keys():
+        if time != T[0]:
+            model.addConstr(y.sum("*", city, time - 1) == x[city, time],
+                        name=f"arrive[{city},{time}]")
+
+def build_dense_model(model: Model, N, T, holidays, distances):
+    x = model.addVars(((i, t) for i in N for t in T), vtype = GRB.BINARY, name="x")
+    y = model.addVars(((i, j, t) for i in N for j in N for t in T[:-1]),
+                      vtype=GRB.BINARY, name="y")
+
+    model.setObjective(gp.quicksum(distances[i, j] * y[i, j, t] for i in N for j in N for t in T[:-1]), GRB.MINIMIZE)
+
+    # Adds problem constraints
+    one_city_day_constraint(model, x, T, N)
+    holiday_block_constraint(model, x, T, N, holidays)
+    time_movement_consistency_departure_constraint(model, x, y, T, N)
+    time_movement_consistency_arrival_constraint(model, x, y, T, N)
+    block_arc_constraint(model, y, T, N, holidays)
+
+    return x, y
+
+def build_sparse_model(model: Model, N, T, holidays, distances, pruned: PrunedArcs | None = None):
+    """Only creates x where there is a holiday and y for arcs that can be used,
+    so the holiday/arc blocking constraints are not needed. With `pruned`
+    (see `prune_arcs`) only the cells and arcs that survived are created."""
+    if pruned is not None:
+        cells = pruned.cells()
+        arcs = pruned.arcs()
+        costs = pruned.arc_cost.tolist()
+    else:
+        layers = layer_cities(N, T, holidays)
+        cells = [(city, time) for time, cities in zip(T, layers) for city in cities]
+        arcs = usable_arcs(T, layers)
+        costs = [distances[i, j] for (i, j, t) in arcs]
+
+    x = model.addVars(cells, vtype=GRB.BINARY, name="x")
+    y = model.addVars(arcs, vtype=GRB.BINARY, name="y")
+
+    model.setObjective(gp.quicksum(cost * y[arc] for arc, cost in zip(arcs, costs)), GRB.MINIMIZE)
+
+    # Adds problem constraints
+    sparse_one_city_day_constraint(model, x, T)
+    sparse_time_movement_consistency_departure_constraint(model, x, y, T)
+    sparse_time_movement_consistency_arrival_constraint(model, x, y, T)
+
+    return x, y
+
+# Matrix formulation
+def build_matrix_model(model: Model, N, T, holidays, distances, pruned: PrunedArcs | None = None):
+    """Sparse formulation assembled as arrays (see `build_tep_matrix_model`) and added in bulk through the MVar API."""
+    matrix = build_tep_matrix_model(N, T, holidays, distances, pruned)
+    n_cells = matrix.n_cells
+
+    x = model.addMVar(n_cells, vtype=GRB.BINARY, name="x")
+    y = model.addMVar(matrix.n_arcs, vtype=GRB.BINARY, name="y")
+
+    model.setObjective(matrix.c[n_cells:] @ y, GRB.MINIMIZE)
+
+    # one_city_day, depart and arrive rows; the columns of A are x then y
+    if matrix.n_arcs:
+        model.addConstr(matrix.A[:, :n_cells] @ x + matrix.A[:, n_cells:] @ y == matrix.b, name="tep")
+    else:
+        model.addConstr(matrix.A[:, :n_cells] @ x == matrix.b, name="tep")
+
+    return x, y, matrix
+
+def read_matrix_plan(x, matrix: TEPMatrixModel) -> list[str]:
+    return matrix.read_plan(x.X)
+
+# Warm start
+def set_plan_start(x, y, T, plan: list[str]) -> None:
+    """Loads a plan as MIP start on tupledict variables (y is only set on the plan's arcs)."""
+    for (city, time), var in x.items():
+        var.Start = 1 if plan[time] == city else 0
+
+    for idx in range(len(T) - 1):
+        y[plan[idx], plan[idx + 1], T[idx]].Start = 1
+
+def set_matrix_plan_start(x, y, matrix: TEPMatrixModel, plan: list[str]) -> None:
+    """Loads a plan as MIP start on the matrix formulation's MVars."""
+    z = matrix.plan_vector(plan)
+    x.Start = z[:matrix.n_cells]
+    y.Start = z[matrix.n_cells:]
+
+def check_plan(T, holidays, plan: list[str]) -> None:
+    if len(plan) != len(T):
+        raise ValueError(f"Initial plan has {len(plan)} days, expected {len(T)}")
+    for time, city in zip(T, plan):
+        if not holidays[city, time]:
+            raise ValueError(f"Initial plan visits {city} at time {time} without a holiday")
+
+def record_incumbent(model: Model, where: int) -> None:
+    """Callback that stores (time, incumbent, bound) every time a new incumbent is found."""
+    if where == GRB.Callback.MIPSOL:
+        model._trajectory.append({
+            "time_s": model.cbGet(GRB.Callback.RUNTIME),
+            "obj_val": model.cbGet(GRB.Callback.MIPSOL_OBJ),
+            "obj_bound": model.cbGet(GRB.Callback.MIPSOL_OBJBND),
+        })
+
+def solve_tep(
+    N,
+    T,
+    holidays,
+    distances,
+    sparse: bool = False,
+    matrix: bool = False,
+    initial_plan: list[str] | None = None,
+    mip_gap: float | None = None,
+    env: gp.Env | None = None,
+    threads: int | None = None,
+    pruned: PrunedArcs | None = None,
+) -> tuple[list[str], dict]:
+    """
+    `initial_plan` (uma cidade por dia, ex.: a solução gulosa) é carregado como
+    MIP start; `mip_gap` encerra a otimização quando o gap relativo chega nele.
+    `env` reaproveita um ambiente Gurobi já aberto (que não é fechado aqui);
+    `threads` limita as threads do Gurobi (ex.: vários solves em paralelo).
+    `pruned` (ver `prune_arcs`) restringe o modelo aos arcos que sobraram da
+    poda; só as formulações esparsa e matricial aceitam (`sparse=True` ou
+    `matrix=True`).
+    """
+    if pruned is not None and not (sparse or matrix):
+        raise ValueError("pruned requires the sparse or matrix formulation (sparse=True or matrix=True)")
+    if initial_plan is not None:
+        check_plan(T, holidays, initial_plan)
+        if pruned is not None and not pruned.contains_plan(initial_plan):
+            raise ValueError("Initial plan uses an arc removed by the pruning")
+
+    owns_env = env is None
+    with (gp.Env() if owns_env else nullcontext(env)) as env, gp.Model(env=env) as model:
         model.setParam("MemLimit", 6) 
         model.setParam('TimeLimit', 600)
-        x = model.addVars(((i, t) for i in N for t in T), vtype = GRB.BINARY, name="x")
-        y = model.addVars(((i, j, t) for i in N for j in N for t in T[:-1]),
-                          vtype=GRB.BINARY, name="y")
-        
-        model.setObjective(gp.quicksum(distances[i, j] * y[i, j, t] for i in N for j in N for t in T[:-1]), GRB.MINIMIZE)
-
-        # Adds problem constraints
-        one_city_day_constraint(model, x, T, N)
-        holiday_block_constraint(model, x, T, N, holidays) 
-        time_movement_consistency_departure_constraint(model, x, y, T, N)
-        time_movement_consistency_arrival_constraint(model, x, y, T, N)
-        block_arc_constraint(model, y, T, N, holidays) 
-                
-        model.optimize()
+        if mip_gap is not None:
+            model.setParam("MIPGap", mip_gap)
+        if threads is not None:
+            model.setParam("Threads", threads)
+
+        profile_mark = profiler.mark()
+        build_start = time.perf_counter()
+        with stage("solve_tep.build"):
+            if matrix:
+                formulation = "matrix"
+                x, y, matrix_model = build_matrix_model(model, N, T, holidays, distances, pruned)
+            elif sparse:
+                formulation = "sparse"
+                x, y = build_sparse_model(model, N, T, holidays, distances, pruned)
+            else:
+                formulation = "dense"
+                x, y = build_dense_model(model, N, T, holidays, distances)
+            model.update()
+        build_time = time.perf_counter() - build_start
+
+        if initial_plan is not None:
+            if matrix:
+                set_matrix_plan_start(x, y, matrix_model, initial_plan)
+            else:
+                set_plan_start(x, y, T, initial_plan)
+
+        model._trajectory = []
+        with stage("solve_tep.optimize"):
+            model.optimize(record_incumbent)
 
         if model.Status not in (GRB.OPTIMAL, GRB.TIME_LIMIT):
             raise RuntimeError(f"MIP ended with status {model.Status}")
 
-        chosen = []
-        for t in T:
-            chosen_city = max(N, key=lambda i: x[i, t].X)
-            chosen.append(chosen_city)
+        if matrix:
+            chosen = read_matrix_plan(x, matrix_model)
+        else:
+            chosen = []
+            for t in T:
+                chosen_city = max((i for i in N if (i, t) in x), key=lambda i: x[i, t].X)
+                chosen.append(chosen_city)
 
         runtime = model.Runtime
         obj_val = model.ObjVal
@@ -71,28 +245,26 @@ def solve_tep(N, T, holidays, distances) -> tuple[list[str], float]:
         num_constrs = model.NumConstrs
         node_count = model.NodeCount
 
-        # Número de movimentos (mudança de cidade)
-        num_moves = 0
-        for idx in range(1, len(T)):
-            if chosen[idx] != chosen[idx - 1]:
-                num_moves += 1
-
-        stats  = {
-            "n_cities": len(N),
-            "n_days": len(T),
-            "obj_val": obj_val,
-            "runtime_s": runtime,
-            "mip_gap": mip_gap_final,
-            "num_vars": num_vars,
-            "num_bin_vars": num_bin_vars,
-            "num_constrs": num_constrs,
-            "node_count": node_count,
-            "num_moves": num_moves,
-            "plan": chosen,
-        }
+        stats = solution_stats(
+            N, T, chosen, obj_val, runtime,
+            build_time_s=build_time,
+            mip_gap=mip_gap_final,
+            num_vars=num_vars,
+            num_bin_vars=num_bin_vars,
+            num_constrs=num_constrs,
+            node_count=node_count,
+            formulation=formulation,
+            warm_start=initial_plan is not None,
+            incumbent_trajectory=model._trajectory,
+            pruned_arcs=pruned.removed_arcs if pruned is not None else None,
+            pruned_fraction=pruned.removed_fraction if pruned is not None else None,
+        )
+        if profiler.enabled:
+            stats["stages"] = profiler.stages_since(profile_mark)
 
         model.dispose()
-        env.dispose()
+        if owns_env:
+            env.dispose()
 
         return chosen, stats
 
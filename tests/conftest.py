@@ -0,0 +1,38 @@
+import itertools
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from src.data_types import HolidayData
+from src.holiday_index import HolidayIndex
+from src.solver.dp_solver import layer_cities
+from src.solver.pre_processing import build_tep_inputs, plan_cost
+
+RANDOM_START_DATE, RANDOM_END_DATE = "2025-01-01", "2025-01-10"
+
+
+@pytest.fixture(scope="session")
+def random_holidays() -> list[HolidayData]:
+    """A small random instance: 8 cities, 1 to 4 of them on holiday each day, one day without holidays."""
+    rng = np.random.default_rng(7)
+    cities = [(f"Cidade {k} - SP", rng.uniform(-30, -5), rng.uniform(-60, -35)) for k in range(8)]
+
+    rows = []
+    for offset in range(9):
+        if offset == 4:
+            continue
+        day = date.fromisoformat(RANDOM_START_DATE) + timedelta(days=offset)
+        for k in rng.choice(len(cities), size=rng.integers(1, 5), replace=False).tolist():
+            name, lat, lon = cities[k]
+            rows.append(HolidayData("SP", f"{day:%d/%m/%Y} - Feriado", "Feriado", "", day, name, lat, lon))
+    return rows
+
+@pytest.fixture(scope="session")
+def random_instance(random_holidays):
+    N, T, H, dist, _ = build_tep_inputs(HolidayIndex(random_holidays), RANDOM_START_DATE, RANDOM_END_DATE, as_matrix=True)
+    return N, T, H, dist
+
+@pytest.fixture(scope="session")
+def brute_force_costs(random_instance) -> list[float]:
+    """Cost of every feasible plan of `random_instance`, in increasing order."""
+    N, T, H, dist = random_instance
+    return sorted(plan_cost(list(plan), dist) for plan in itertools.product(*layer_cities(N, T, H)))
@@ -0,0 +1,13 @@
+import pytest
+from src.solver.dp_solver import layer_cities, solve_tep_dp
+from src.solver.pre_processing import plan_cost
+
+
+def test_dp_matches_brute_force(random_instance, brute_force_costs):
+    N, T, H, dist = random_instance
+    plan, stats = solve_tep_dp(N, T, H, dist)
+
+    assert stats["obj_val"] == pytest.approx(brute_force_costs[0])
+    assert plan_cost(plan, dist) == pytest.approx(stats["obj_val"])
+    assert all(city in cities for city, cities in zip(plan, layer_cities(N, T, H), strict=True))
+    assert stats["n_days"] == len(T)
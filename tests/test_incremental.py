@@ -0,0 +1,30 @@
+import pytest
+from src.holiday_index import HolidayIndex
+from src.solver.dp_solver import solve_tep_dp
+from src.solver.incremental import IncrementalPlanner
+from src.solver.pre_processing import build_tep_inputs
+
+WINDOWS = [
+    ("2025-01-01", "2025-01-10"),
+    ("2025-01-01", "2025-01-06"),  # shrinks the end
+    ("2025-01-03", "2025-01-08"),  # slides both ends
+    ("2025-01-02", "2025-01-05"),  # moves the start back while trimming the end
+    ("2025-01-02", "2025-01-10"),  # extends the end
+]
+
+
+def test_incremental_planner_matches_dp(random_holidays, random_instance):
+    dist = random_instance[3]
+    index = HolidayIndex(random_holidays)
+    planner = IncrementalPlanner(index, dist, *WINDOWS[0])
+
+    for start_date, end_date in WINDOWS:
+        planner.set_window(start_date, end_date)
+        plan, stats = planner.plan()
+
+        N, T, H, _, _ = build_tep_inputs(index, start_date, end_date)
+        _, dp_stats = solve_tep_dp(N, T, H, dist)
+        assert stats["obj_val"] == pytest.approx(dp_stats["obj_val"])
+        assert (stats["n_cities"], stats["n_days"]) == (len(N), len(T))
+        assert len(plan) == len(T)
+        assert stats["layers_recomputed"] <= len(T)
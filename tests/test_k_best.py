@@ -0,0 +1,16 @@
+import pytest
+from src.solver.dp_solver import k_best_plans, solve_tep_dp
+from src.solver.pre_processing import plan_cost
+
+
+def test_k_best_matches_brute_force(random_instance, brute_force_costs):
+    N, T, H, dist = random_instance
+    _, dp_stats = solve_tep_dp(N, T, H, dist)
+
+    plans = k_best_plans(N, T, H, dist, k=10, max_block=16)  # small blocks exercise the chunking
+
+    assert plans[0]["obj_val"] == pytest.approx(dp_stats["obj_val"])
+    assert [p["obj_val"] for p in plans] == pytest.approx(brute_force_costs[:10])
+    assert len({tuple(p["plan"]) for p in plans}) == len(plans)
+    for p in plans:
+        assert plan_cost(p["plan"], dist) == pytest.approx(p["obj_val"])
@@ -0,0 +1,19 @@
+import pytest
+from src.solver.dp_solver import layer_cities, solve_tep_dp
+from src.solver.local_search import solve_tep_local_search
+from src.solver.other_strategies import solve_tep_greedy
+from src.solver.pre_processing import plan_cost
+
+
+def test_local_search_is_feasible_and_no_worse_than_greedy(random_instance):
+    N, T, H, dist = random_instance
+    _, dp_stats = solve_tep_dp(N, T, H, dist)
+    _, greedy_stats = solve_tep_greedy(N, T, H, dist)
+
+    plan, stats = solve_tep_local_search(N, T, H, dist, time_budget_s=2.0, workers=1, restarts=2, max_segment=len(T))
+
+    assert all(city in cities for city, cities in zip(plan, layer_cities(N, T, H), strict=True))
+    assert plan_cost(plan, dist) == pytest.approx(stats["obj_val"])
+    assert dp_stats["obj_val"] - 1e-6 <= stats["obj_val"] <= greedy_stats["obj_val"] + 1e-6
+    # A segment can span the whole plan, so one DP move already reaches the optimum
+    assert stats["obj_val"] == pytest.approx(dp_stats["obj_val"])
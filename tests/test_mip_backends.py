@@ -0,0 +1,20 @@
+import pytest
+from src.solver.dp_solver import layer_cities, solve_tep_dp
+from src.solver.mip_backends import get_backend, solve_tep_mip
+from src.solver.pre_processing import plan_cost
+
+
+def test_scipy_backend_matches_dp(random_instance):
+    N, T, H, dist = random_instance
+    _, dp_stats = solve_tep_dp(N, T, H, dist)
+
+    plan, stats = solve_tep_mip(N, T, H, dist, backend="scipy")
+
+    assert stats["obj_val"] == pytest.approx(dp_stats["obj_val"])
+    assert plan_cost(plan, dist) == pytest.approx(stats["obj_val"])
+    assert all(city in cities for city, cities in zip(plan, layer_cities(N, T, H), strict=True))
+    assert stats["backend"] == "scipy"
+
+def test_get_backend_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        get_backend("cplex")
@@ -0,0 +1,69 @@
+import os
+import pytest
+from src.holiday_index import HolidayIndex
+from src.read_holiday import iter_holidays
+from src.solver.dp_solver import solve_tep_dp
+from src.solver.mip_backends import solve_tep_mip
+from src.solver.other_strategies import solve_tep_greedy
+from src.solver.pre_processing import build_tep_inputs, prune_arcs
+
+FILE_NAME = os.path.join(os.path.dirname(__file__), "..", "data", "feriados_com_pos.csv")
+START_DATE, END_DATE = "2025-03-01", "2025-03-08"
+
+
+@pytest.fixture(scope="module")
+def instance():
+    index = HolidayIndex(iter_holidays(FILE_NAME, START_DATE, END_DATE))
+    N, T, H, dist, _ = build_tep_inputs(index, START_DATE, END_DATE, as_matrix=True)
+    return N, T, H, dist
+
+def test_pruning_keeps_the_optimum(instance):
+    N, T, H, dist = instance
+    plan, stats = solve_tep_dp(N, T, H, dist)
+
+    # Without an upper bound the DP optimum is used, so the pruning removes the most it can
+    pruned = prune_arcs(N, T, H, dist)
+    assert pruned.upper_bound == pytest.approx(stats["obj_val"])
+    assert pruned.removed_arcs > 0
+    assert pruned.contains_plan(plan)
+
+    _, pruned_stats = solve_tep_mip(N, T, H, dist, backend="scipy", pruned=pruned)
+    assert pruned_stats["obj_val"] == pytest.approx(stats["obj_val"])
+
+def test_pruning_with_the_greedy_bound_keeps_the_optimum(instance):
+    N, T, H, dist = instance
+    _, stats = solve_tep_dp(N, T, H, dist)
+    _, greedy_stats = solve_tep_greedy(N, T, H, dist)
+
+    pruned = prune_arcs(N, T, H, dist, upper_bound=greedy_stats["obj_val"])
+    _, pruned_stats = solve_tep_mip(N, T, H, dist, backend="scipy", pruned=pruned)
+    assert pruned_stats["obj_val"] == pytest.approx(stats["obj_val"])
+    assert pruned_stats["pruned_fraction"] == pytest.approx(pruned.removed_fraction)
+
+def test_pruning_removes_arcs_on_a_multi_week_window():
+    start_date, end_date = "2025-01-01", "2025-02-15"
+    index = HolidayIndex(iter_holidays(FILE_NAME, start_date, end_date))
+    N, T, H, dist, _ = build_tep_inputs(index, start_date, end_date, as_matrix=True)
+    plan, stats = solve_tep_dp(N, T, H, dist)
+
+    pruned = prune_arcs(N, T, H, dist)
+    assert pruned.removed_fraction > 0.5
+    assert pruned.contains_plan(plan)
+
+    _, pruned_stats = solve_tep_mip(N, T, H, dist, backend="scipy", pruned=pruned)
+    assert pruned_stats["obj_val"] == pytest.approx(stats["obj_val"])
+
+def test_pruning_rejects_a_bound_below_the_optimum(instance):
+    N, T, H, dist = instance
+    _, stats = solve_tep_dp(N, T, H, dist)
+
+    with pytest.raises(ValueError):
+        prune_arcs(N, T, H, dist, upper_bound=stats["obj_val"] - 1.0)
+
+def test_solve_tep_rejects_pruned_dense_model(instance):
+    pytest.importorskip("gurobipy")
+    from src.solver.solver import solve_tep
+
+    N, T, H, dist = instance
+    with pytest.raises(ValueError):
+        solve_tep(N, T, H, dist, pruned=prune_arcs(N, T, H, dist))
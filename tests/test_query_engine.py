@@ -0,0 +1,39 @@
+import itertools
+import pytest
+from src.holiday_index import HolidayIndex
+from src.solver.dp_solver import solve_tep_dp
+from src.solver.pre_processing import build_tep_inputs, plan_cost
+from src.solver.query_engine import HolidayQueryEngine
+
+
+def test_query_engine_matches_dp(random_holidays, random_instance):
+    dist = random_instance[3]
+    index = HolidayIndex(random_holidays)
+    # Blocks of 2 days, so the queries mix checkpoint tables and the direct DP
+    engine = HolidayQueryEngine(index, dist, block_size=2)
+
+    for start_date, end_date in itertools.combinations([d.isoformat() for d in index.dates] + ["2025-01-10"], 2):
+        plan, stats = engine.query(start_date, end_date)
+
+        N, T, H, _, _ = build_tep_inputs(index, start_date, end_date)
+        _, dp_stats = solve_tep_dp(N, T, H, dist)
+        assert stats["obj_val"] == pytest.approx(dp_stats["obj_val"])
+        assert engine.query_cost(start_date, end_date) == pytest.approx(dp_stats["obj_val"])
+        assert plan_cost(plan, dist) == pytest.approx(stats["obj_val"])
+        assert stats["n_days"] == len(T)
+
+def test_query_engine_respects_origin_and_destination(random_holidays, random_instance):
+    dist = random_instance[3]
+    index = HolidayIndex(random_holidays)
+    engine = HolidayQueryEngine(index, dist, block_size=2)
+    start_date, end_date = "2025-01-01", "2025-01-10"
+    origin, destination = engine.layers[0][-1], engine.layers[-1][0]
+
+    plan, stats = engine.query(start_date, end_date, origin=origin, destination=destination)
+
+    best = min(
+        plan_cost([origin, *middle, destination], dist)
+        for middle in itertools.product(*engine.layers[1:-1])
+    )
+    assert (plan[0], plan[-1]) == (origin, destination)
+    assert stats["obj_val"] == pytest.approx(best)